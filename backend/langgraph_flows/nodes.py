@@ -3,12 +3,17 @@ import os
 import re
 from langgraph_flows.state import HRPipelineState
 from services.llm import get_llm
+from services.llm_cache import invoke_with_fresh_retry
 from services.sheets import read_sheet, write_to_sheet, append_to_sheet
+from services.sheet_writer import buffered_append
 from services.gmail import send_email
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from typing import Dict, Any
 
+# Full resume texts are capped like the import's batch parser does
+ANALYSIS_MAX_RESUME_CHARS = 40000
+
 # Prompts
 JD_PROMPT = """You are an expert HR Recruiter. Extract requirements from the Job Description below.
 Return ONLY a valid JSON object. Do NOT include any markdown formatting, python code, or explanations. 
@@ -72,7 +77,7 @@ def extract_jd_requirements_node(state: HRPipelineState) -> HRPipelineState:
     parser = JsonOutputParser()
     chain = PromptTemplate(template=JD_PROMPT, input_variables=["jd_text"]) | llm | parser
     
-    requirements = chain.invoke({"jd_text": jd_text})
+    requirements = invoke_with_fresh_retry(chain, {"jd_text": jd_text})
     
     # Save to ActiveJobSheet in STRUCTURED format compatible typically with get_all_job_descriptions
     # Format: [Job Title, Description, Required Skills, Top Projects Reference, Timestamp]
@@ -114,10 +119,29 @@ def fetch_new_candidates_node(state: HRPipelineState) -> HRPipelineState:
 
 
 
+def load_full_resume_text(state: HRPipelineState):
+    """Full CV text saved at import time (local SQLite store, no network). None if not stored."""
+    try:
+        from services.resume_text_store import get_resume_text_store
+        return get_resume_text_store().get(
+            source_key=(state.get("candidate_data") or {}).get("Source"),
+            resume_link=state.get("resume_url")
+        )
+    except Exception as e:
+        print(f"⚠️ Resume text store lookup failed: {e}")
+        return None
+
 def analyze_cv_node(state: HRPipelineState) -> HRPipelineState:
+    # Prefer the real resume text; the summary columns from the sheet are the fallback
+    resume_text = state.get("resume_text")
+    full_text = load_full_resume_text(state)
+    if full_text:
+        print(f"📄 Analyzing full resume text ({len(full_text)} chars) for {state['candidate_data'].get('Name')}")
+        resume_text = full_text[:ANALYSIS_MAX_RESUME_CHARS]
+
     # Validations
     fail_reason = None
-    if not state.get("resume_text"):
+    if not resume_text:
         fail_reason = "No resume text"
     
     jd_reqs = state.get("jd_requirements")
@@ -166,7 +190,7 @@ def analyze_cv_node(state: HRPipelineState) -> HRPipelineState:
         from services.sheets import ensure_sheet_exists
         ensure_sheet_exists(analysis_sheet_name, ANALYSIS_HEADERS)
         
-        append_to_sheet(f"{analysis_sheet_name}!A:K", [row])
+        buffered_append(f"{analysis_sheet_name}!A:K", [row])
         return {"verdict": "FAIL", "analysis_result": {"reason": fail_reason}}
     
     llm = get_llm()
@@ -187,7 +211,7 @@ def analyze_cv_node(state: HRPipelineState) -> HRPipelineState:
         # Fallback for old style or raw JSON
         jd_context_str = json.dumps(jd_reqs)
 
-    analysis = chain.invoke({"jd_requirements": jd_context_str, "resume_text": state["resume_text"]})
+    analysis = invoke_with_fresh_retry(chain, {"jd_requirements": jd_context_str, "resume_text": resume_text})
     
     # Enforce Score Threshold
     raw_score = str(analysis.get("match_score", "0")).replace("%", "").strip()
@@ -222,7 +246,7 @@ def analyze_cv_node(state: HRPipelineState) -> HRPipelineState:
     
     from services.sheets import ensure_sheet_exists
     ensure_sheet_exists(analysis_sheet_name, ANALYSIS_HEADERS)
-    append_to_sheet(f"{analysis_sheet_name}!A:K", [row])
+    buffered_append(f"{analysis_sheet_name}!A:K", [row])
     
     return {"analysis_result": analysis, "verdict": verdict}
 
@@ -237,7 +261,7 @@ def generate_hr_questions_node(state: HRPipelineState) -> HRPipelineState:
     parser = JsonOutputParser()
     chain = PromptTemplate(template=HR_QUESTIONS_PROMPT, input_variables=["candidate_name", "job_applied_for", "analysis_result"]) | llm | parser
     
-    questions_data = chain.invoke({
+    questions_data = invoke_with_fresh_retry(chain, {
         "candidate_name": candidate_name, 
         "job_applied_for": job, 
         "analysis_result": json.dumps(analysis)
@@ -249,7 +273,7 @@ def generate_hr_questions_node(state: HRPipelineState) -> HRPipelineState:
     questions_list = "\n".join(questions_data.get("recommended_questions", []))
     resume_link = state.get("resume_url", "N/A")
     row = [datetime.now().isoformat(), candidate_name, job, resume_link, questions_list]
-    append_to_sheet("HRQuestions!A:E", [row])
+    buffered_append("HRQuestions!A:E", [row])
     
     return {"hr_questions": questions_data}
 
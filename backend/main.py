@@ -61,6 +61,18 @@ app.include_router(api_router, prefix="/api")
 app.include_router(dashboard_router, prefix="/api", tags=["dashboard"])
 app.include_router(interview_router, prefix="/api/interview", tags=["interview"])
 
+@app.on_event("startup")
+def resume_background_jobs():
+    # Pick up interview grading jobs left over from a previous run
+    from services.interview_grading import start_grading_worker
+    start_grading_worker()
+
+@app.on_event("shutdown")
+def flush_pending_sheet_writes():
+    # Write-behind buffer (services/sheet_writer.py) must not lose queued rows
+    from services.sheet_writer import append_buffer
+    append_buffer.close()
+
 @app.get("/")
 def read_root():
     return {"message": "HR Pipeline API is running"}
@@ -22,16 +22,22 @@ class CandidateData(BaseModel):
     job_applied: str
 
 from services.sheets import read_sheet, write_to_sheet, ensure_sheet_exists, get_source_sheet_name, append_to_sheet, invalidate_job_cache
-from services.drive_service import list_files_in_folder, download_file
-from services.resume_parser import parse_resume, parse_resumes_batch
+from services.drive_service import list_files_in_folder, download_files, prefilter_resume_files, RESUME_MIME_TYPES
+from services.resume_parser import parse_resume, parse_resumes_batch_bisecting
+from services.sheet_replica import read_sheet_replica
+from services.resume_cache import get_resume_cache, cache_key
+from services.resume_text_store import get_resume_text_store
+from services.batch_planner import get_batch_planner, INPUT_TOKEN_BUDGET
+from services.llm_cache import invoke_with_fresh_retry
+from collections import deque
 import os
+import time
 import datetime
 
 @router.post("/submit-jd")
 def submit_jd(jd: JDSubmission):
     # Enforce Headers for ActiveJobSheet
-    ensure_sheet_exists("ActiveJobSheet")
-    write_to_sheet("ActiveJobSheet!A1:E1", [["Job Title", "Description", "Required Skills", "Top Projects Reference", "Timestamp"]])
+    ensure_sheet_exists("ActiveJobSheet", ["Job Title", "Description", "Required Skills", "Top Projects Reference", "Timestamp"])
     
     result = extract_jd_requirements_node({"jd_text": jd.jd_text})
     
@@ -90,7 +96,8 @@ def import_from_drive(
     job_title_filter: Optional[str] = None,
     time_period: Optional[str] = Query(None, description="Time period filter: ALL, LAST_7_DAYS, LAST_30_DAYS, CUSTOM"),
     start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"),
-    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format")
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format"),
+    incremental: bool = Query(False, description="Only import files added/changed since the last incremental run (Drive Changes API). Date filters are ignored.")
 ):
     folder_id = os.getenv("GOOGLE_DRIVE_FOLDER_ID")
     if not folder_id:
@@ -156,7 +163,7 @@ def import_from_drive(
     errors = []
     
     # NEW: Folder-Based Iteration
-    from services.drive_service import list_folders, list_files_recursive
+    from services.drive_service import list_folders, iter_files_recursive
     from services.sheets import get_all_job_descriptions
     
     # Get all valid JDs to validate folder names against
@@ -214,8 +221,8 @@ def import_from_drive(
             parser = JsonOutputParser()
             chain = PromptTemplate(template=matcher_prompt, input_variables=["job_title", "folders_list"]) | llm | parser
             
-            # Run LLM
-            matched_names = chain.invoke({"job_title": job_title_filter, "folders_list": json.dumps(folder_names)})
+            # Run LLM (an unparseable, possibly cached, answer is asked for again once)
+            matched_names = invoke_with_fresh_retry(chain, {"job_title": job_title_filter, "folders_list": json.dumps(folder_names)})
             
             if matched_names and isinstance(matched_names, list) and len(matched_names) > 0:
                 print(f"✅ Semantic Match Found: {matched_names}")
@@ -259,67 +266,163 @@ def import_from_drive(
             else:
                 return {"message": f"No folders found matching '{job_title_filter}'", "errors": [], "scanned_folders": []} 
     
+    # INCREMENTAL MODE (Drive Changes API)
+    # changed_files_by_folder: job folder id -> changed files, or None for a full tree scan
+    changed_files_by_folder = None
+    new_page_token = None
+    sync_mode = "full"
+    if incremental:
+        from services.drive_changes import (get_saved_page_token, get_start_page_token, get_retry_file_ids,
+                                            get_files, list_changed_files, group_by_job_folder, PageTokenExpired)
+        # "Since last run" replaces the date window (a window would leave gaps between runs)
+        min_date = max_date = None
+        saved_token = get_saved_page_token(folder_id)
+        if saved_token:
+            try:
+                changed_files, new_page_token = list_changed_files(saved_token)
+                # Files that failed last time aren't in changes.list anymore: add them back
+                changed_ids = {f['id'] for f in changed_files}
+                retry_ids = [fid for fid in get_retry_file_ids(folder_id) if fid not in changed_ids]
+                if retry_ids:
+                    print(f"🔁 Retrying {len(retry_ids)} file(s) that failed in the previous run")
+                    changed_files += get_files(retry_ids)
+                changed_files_by_folder = group_by_job_folder(changed_files, folder_id, folders)
+                sync_mode = "incremental"
+            except PageTokenExpired as e:
+                print(f"⚠️ Saved Drive page token rejected ({e}). Falling back to a full rescan.")
+                sync_mode = "full (token expired)"
+        else:
+            sync_mode = "full (no saved token)"
+
+        if changed_files_by_folder is None:
+            # Token for "now", taken BEFORE the scan so changes made during it are seen next run
+            new_page_token = get_start_page_token()
+        print(f"🔁 Drive import mode: {sync_mode}")
+
     # BATCHING LOGIC
-    BATCH_SIZE = 10
+    # Files are extracted in rounds of planner.item_limit(); the LLM calls inside a round are packed
+    # by token budget (services/batch_planner.py). An underfilled last LLM batch is held back in
+    # carry_over and packed together with the next round's resumes (flushed with final=True at the end).
+    planner = get_batch_planner()
+    # One set of extraction worker processes for the whole import (spawned on the first batch)
+    from services.text_extraction import ExtractionPool, extract_texts
+    extraction_pool = ExtractionPool()
     batch_buffer = [] # Stores dicts: {'content': bytes, 'filename': str, 'source_key': str, 'job_title': str, 'file_obj': dict}
+    carry_over = []   # Extracted resumes waiting for a fuller LLM batch
+    run_batch_stats = {"llm_calls": 0, "resumes_sent": 0, "est_input_tokens": 0}
+    # Drive files that failed this run (retried by the next incremental run, see drive_changes)
+    failed_file_ids = set()
+    token_blocked = False  # A folder couldn't be scanned in a full scan: don't advance the token at all
 
-    def process_batch(buffer_list, errors_list):
+    def mark_failed(file_obj):
+        if file_obj and file_obj.get('id'):
+            failed_file_ids.add(file_obj['id'])
+    recovery_stats = {"bisect_calls": 0, "recovered": 0, "failed": 0}  # parse_resumes_batch_bisecting
+
+    def record_llm_call(batch_data, latency_s, ok):
+        # Top-level batch calls only: bisected retries are counted in recovery_stats, not as capacity signals
+        est_tokens = planner.batch_tokens(batch_data, lambda pair: pair[1])
+        planner.record(len(batch_data), est_tokens, latency_s, ok)
+        run_batch_stats["llm_calls"] += 1
+        run_batch_stats["resumes_sent"] += len(batch_data)
+        run_batch_stats["est_input_tokens"] += est_tokens
+
+    def process_batch(buffer_list, errors_list, final=False):
+        nonlocal skipped_files_count, carry_over
+        buffer_list, carry_over = carry_over + buffer_list, []
         if not buffer_list: return 0
         
-        # 1. Extract texts from files (CPU bound, fast-ish)
-        from services.pdf import extract_text_from_pdf
-        from services.docx_parser import extract_text_from_docx
-        import re
-
-        texts_payload = [] # (filename, text)
+        # 1. Extract texts from files (CPU bound -> worker processes, results in completion order)
+        texts_payload = [] # (filename, text) for resumes that still need the LLM
         valid_items = []   # items that successfully extracted text
+        extracted = {}     # buffer index -> text ("" = nothing readable, None = extraction failed)
 
-        for item in buffer_list:
-            fname = item['filename']
-            content = item['content']
-            text = ""
-            try:
-                if fname.lower().endswith(".pdf"):
-                    text = extract_text_from_pdf(content)
-                elif fname.lower().endswith(".docx"):
-                    text = extract_text_from_docx(content)
-                else:
-                    try: text = content.decode('utf-8')
-                    except: pass
-                
-                if text:
-                    text = re.sub(r'\s+', ' ', text).strip()
-                
-                if text and len(text) > 50:
-                    texts_payload.append((fname, text))
-                    valid_items.append(item)
-                else:
-                    errors_list.append(f"{fname}: Empty/Unreadable text")
-            except Exception as ex:
-                errors_list.append(f"{fname}: Extraction Error - {ex}")
+        to_extract = [(idx, item['content'], item['filename'])
+                      for idx, item in enumerate(buffer_list) if not item.get('text')]  # Cache hits skip this
+        for idx, text, extract_err in extract_texts(to_extract, pool=extraction_pool):
+            item = buffer_list[idx]
+            if extract_err is not None:
+                errors_list.append(f"{item['filename']}: Extraction Error - {extract_err}")
+                mark_failed(item.get('file_obj'))
+                extracted[idx] = None
+            else:
+                extracted[idx] = text
+            if resume_cache and item.get('cache_key'):
+                resume_cache.put(item['cache_key'], raw=item['content'], text=text or None)
 
-        if not texts_payload: 
+        for idx, item in enumerate(buffer_list):
+            text = item.get('text') or extracted.get(idx)
+            if text is None:
+                continue  # Already reported as an extraction error
+            if len(text) > 50:
+                item['text'] = text
+                valid_items.append(item)
+                if not item.get('parsed'):
+                    texts_payload.append((item['filename'], text))
+            else:
+                errors_list.append(f"{item['filename']}: Empty/Unreadable text")
+
+        if not valid_items: 
             print(f"⚠️ Batch had no valid text extracted from {len(buffer_list)} files")
             return 0
 
+        # Keep the full text for CV analysis (trigger-candidate-sync reads it back locally)
+        text_store = get_resume_text_store()
+        for item in valid_items:
+            if item.get('stored'):
+                continue  # Carried over from an earlier round, already saved
+            item['stored'] = True
+            try:
+                text_store.put(item['source_key'], item['text'],
+                               resume_link=item.get('file_obj', {}).get('webViewLink'),
+                               content_key=item.get('cache_key'))
+            except Exception as store_err:
+                print(f"⚠️ Could not store resume text for {item['filename']}: {store_err}")
+
+
+        # 2. Call Batch LLM (only for resumes the cache hasn't parsed before), packed by token budget
+        needs_llm = [item for item in valid_items if not item.get('parsed')]
+        text_of = lambda item: item['text']
+        llm_batches = planner.plan(needs_llm, text_of)
+        if not final and llm_batches and planner.is_underfilled(llm_batches[-1], text_of):
+            held = llm_batches.pop()
+            carry_over = held
+            planner.note_held_back(len(held))
+            held_ids = {id(item) for item in held}
+            valid_items = [item for item in valid_items if id(item) not in held_ids]
+            print(f"⏸️ Holding {len(held)} resumes for a fuller LLM batch")
+        if len(needs_llm) < len(valid_items):
+            print(f"♻️ {len(valid_items) - len(needs_llm)} resumes parsed from cache (no LLM call)")
 
-        # 2. Call Batch LLM
-        print(f"🤖 Sending {len(texts_payload)} resumes to LLM for parsing...")
         import sys
-        sys.stdout.flush() 
-        
-        parsed_results = parse_resumes_batch(texts_payload)
-        
-        print(f"✅ LLM returned {len(parsed_results)} parsed results")
+        for llm_batch in llm_batches:
+            texts_payload = [(item['filename'], item['text']) for item in llm_batch]
+            est_tokens = planner.batch_tokens(llm_batch, text_of)
+            print(f"🤖 Sending {len(texts_payload)} resumes (~{est_tokens} tokens) to LLM for parsing...")
+            sys.stdout.flush()
+
+            # One result per input, matched by echoed ID (None = isolated and still failing)
+            llm_results = parse_resumes_batch_bisecting(texts_payload, stats=recovery_stats,
+                                                        on_call=record_llm_call)
+            print(f"✅ LLM parsed {sum(1 for r in llm_results if r is not None)}/{len(llm_batch)} resumes")
+
+            for item, data in zip(llm_batch, llm_results):
+                if data is None:
+                    continue
+                item['parsed'] = data
+                if resume_cache and item.get('cache_key'):
+                    resume_cache.put(item['cache_key'], parsed=data)
+        parsed_results = [item.get('parsed') for item in valid_items]
         
         processed_count = 0
         
         # Group rows by Target Sheet (Job Title)
         from collections import defaultdict
         rows_by_sheet = defaultdict(list)
+        files_by_sheet = defaultdict(list)  # Drive files behind each sheet's rows (for failure tracking)
         
         for idx, item in enumerate(valid_items):
-            if idx < len(parsed_results):
+            if parsed_results[idx] is not None:
                 data = parsed_results[idx]
                 target_job_sheet = item['job_title']
                 
@@ -366,9 +469,11 @@ def import_from_drive(
                     resume_link_val
                 ]
                 rows_by_sheet[target_job_sheet].append(row)
+                files_by_sheet[target_job_sheet].append(file_obj)
                 processed_count += 1
             else:
-                errors_list.append(f"{item['filename']}: LLM returned fewer results than inputs")
+                errors_list.append(f"{item['filename']}: LLM could not parse this resume (isolated after batch retries)")
+                mark_failed(item.get('file_obj'))
 
         print(f"📊 Batch Summary: {processed_count} new candidates")
         
@@ -435,9 +540,57 @@ def import_from_drive(
                 except Exception as sheet_err:
                     print(f"❌ SHEET WRITE FAILED for {sheet_name}: {sheet_err}")
                     errors_list.append(f"Sheet write error ({sheet_name}): {sheet_err}")
+                    for file_obj in files_by_sheet[sheet_name]:
+                        mark_failed(file_obj)
         
         return processed_count
 
+    def new_files(files, job_title):
+        """Listed files minus the ones already imported into this job's sheet (checked BEFORE downloading)."""
+        nonlocal skipped_files_count
+        sheet_data = get_sheet_data(job_title)
+        for f in files:
+            # PRE-CHECK: Source Duplication (Optimization)
+            if f"Drive: {f['name']}" in sheet_data['sources']:
+                print(f"DEBUG: Skipping duplicate {f['name']}")
+                skipped_files_count += 1
+                continue
+            yield f
+
+    resume_cache = get_resume_cache()
+    resume_cache_hits = 0
+    filter_stats = {"filtered_mime": 0, "filtered_size": 0}
+
+    def fetch_resumes(files, job_title):
+        """
+        Yields (file, content, cached, error) for every new file.
+        Resumes already in the content-addressed cache skip the download (and, if parsed, the LLM);
+        the rest go through the parallel download pool.
+        """
+        nonlocal resume_cache_hits
+        cache_hits = deque()
+
+        def to_download():
+            for f in new_files(files, job_title):
+                cached = resume_cache.get(cache_key(f)) if resume_cache else None
+                if cached:
+                    print(f"♻️ Resume cache hit for {f['name']} (no download)")
+                    cache_hits.append((f, cached))
+                    continue
+                print(f"DEBUG: Downloading {f['name']}...")
+                yield f
+
+        for f, content, download_err in download_files(to_download()):
+            while cache_hits:
+                hit, cached = cache_hits.popleft()
+                resume_cache_hits += 1
+                yield hit, cached['raw'], cached, None
+            yield f, content, None, download_err
+        while cache_hits:
+            hit, cached = cache_hits.popleft()
+            resume_cache_hits += 1
+            yield hit, cached['raw'], cached, None
+
     # Loop through folders
     for folder in folders:
         folder_name = folder['name'].strip()
@@ -461,26 +614,24 @@ def import_from_drive(
 
         try:
             # Pass MIN_DATE and MAX_DATE to list_files
-            files = list_files_recursive(folder['id'], min_date=min_date, max_date=max_date)
-            print(f"DEBUG: Recursive scan found {len(files)} files in folder '{folder_name}' matching filter")
+            # Streamed: downloads start while deeper subfolders are still being listed
+            if changed_files_by_folder is not None:
+                files = changed_files_by_folder.get(folder['id'], [])
+            else:
+                files = iter_files_recursive(folder['id'], min_date=min_date, max_date=max_date,
+                                             mime_types=RESUME_MIME_TYPES)
+            # Size cap (+ MIME allowlist for changes.list, which can't filter server-side)
+            files = prefilter_resume_files(files, filter_stats, mime_types=RESUME_MIME_TYPES)
             
-            for f in files:
-                source_key = f"Drive: {f['name']}"
-                
-                # PRE-CHECK: Source Duplication (Optimization)
-                # Ensure we have the data for this sheet
-                # Ensure we have the data for this sheet
-                sheet_data = get_sheet_data(canonical_job_title)
-                
-                if source_key in sheet_data['sources']:
-                     print(f"DEBUG: Skipping duplicate {f['name']}")
-                     skipped_files_count += 1
-                     continue
+            # Downloads run in a bounded pool (overlapping with parsing); results arrive as they finish
+            for f, content, cached, download_err in fetch_resumes(files, canonical_job_title):
+                if download_err is not None:
+                    print(f"❌ Error downloading {f['name']}: {download_err}")
+                    errors.append(f"{f['name']}: Download Error - {str(download_err)}")
+                    mark_failed(f)
+                    continue
 
                 try:
-                    print(f"DEBUG: Downloading {f['name']}...")
-                    content = download_file(f['id'])
-                    
                     parser_filename = f['name']
                     if '.' not in parser_filename:
                         parser_filename += ".docx" 
@@ -488,13 +639,16 @@ def import_from_drive(
                     batch_buffer.append({
                         'content': content, 
                         'filename': parser_filename, 
-                        'source_key': source_key,
+                        'source_key': f"Drive: {f['name']}",
                         'job_title': canonical_job_title,
-                        'file_obj': f
+                        'file_obj': f,
+                        'cache_key': cache_key(f),
+                        'text': cached['text'] if cached else None,
+                        'parsed': cached['parsed'] if cached else None
                     })
                     print(f"DEBUG: Added {f['name']} to buffer. Size: {len(batch_buffer)}")
 
-                    if len(batch_buffer) >= BATCH_SIZE:
+                    if len(batch_buffer) >= planner.item_limit():
                         print(f"🔄 Processing Batch (Files {imported_count + 1}-{imported_count + len(batch_buffer)})...")
                         cnt = process_batch(batch_buffer, errors)
                         imported_count += cnt
@@ -503,7 +657,8 @@ def import_from_drive(
                     
                 except Exception as e:
                     print(f"❌ Error processing {f['name']}: {e}")
-                    errors.append(f"{f['name']}: Download Error - {str(e)}")
+                    errors.append(f"{f['name']}: Processing Error - {str(e)}")
+                    mark_failed(f)
             
             # Process remaining in folder
             if batch_buffer:
@@ -514,6 +669,26 @@ def import_from_drive(
         except Exception as folder_err:
              print(f"❌ Error scanning folder {folder_name}: {folder_err}")
              errors.append(f"Folder Access Error: {folder_name}")
+             if changed_files_by_folder is not None:
+                 for f in changed_files_by_folder.get(folder['id'], []):
+                     mark_failed(f)
+             else:
+                 token_blocked = True
+
+    # Resumes still held back for packing go out now, whatever the batch fill
+    if carry_over:
+        imported_count += process_batch([], errors, final=True)
+    extraction_pool.close()  # (if the import dies before this, the executor stops its workers once collected)
+
+    # Advance the token only after a run that covered EVERY job folder
+    # (a job_title_filter run skipped the other folders' changes -> they stay pending)
+    if new_page_token and not job_title_filter:
+        if token_blocked:
+            # Some folder wasn't scanned at all: keep the old token so the next run covers it again
+            print("⚠️ Not advancing the Drive page token: a job folder could not be scanned")
+        else:
+            from services.drive_changes import save_page_token
+            save_page_token(folder_id, new_page_token, failed_file_ids=failed_file_ids)
 
     return {
         "message": f"Imported {imported_count} candidates.", 
@@ -522,7 +697,19 @@ def import_from_drive(
         "stats": {
             "imported": imported_count,
             "skipped_existing_files": skipped_files_count,
-            "scanned_folders_count": len(folders)
+            "scanned_folders_count": len(folders),
+            "resume_cache_hits": resume_cache_hits,
+            "filtered_unsupported_type": filter_stats["filtered_mime"],
+            "filtered_too_large": filter_stats["filtered_size"],
+            "sync_mode": sync_mode,
+            "failed_files": len(failed_file_ids),
+            "llm_calls": run_batch_stats["llm_calls"],
+            "avg_resumes_per_call": round(run_batch_stats["resumes_sent"] / run_batch_stats["llm_calls"], 2) if run_batch_stats["llm_calls"] else 0.0,
+            "avg_est_input_tokens_per_call": round(run_batch_stats["est_input_tokens"] / run_batch_stats["llm_calls"]) if run_batch_stats["llm_calls"] else 0,
+            "llm_bisect_retry_calls": recovery_stats["bisect_calls"],
+            "llm_recovered_by_bisect": recovery_stats["recovered"],
+            "llm_failed_resumes": recovery_stats["failed"],
+            "packing_efficiency": round(run_batch_stats["est_input_tokens"] / (run_batch_stats["llm_calls"] * INPUT_TOKEN_BUDGET), 3) if run_batch_stats["llm_calls"] else 0.0
         }
     }
 
@@ -532,9 +719,8 @@ def trigger_sync(background_tasks: BackgroundTasks, job_filter: Optional[str] =
     ensure_sheet_exists("ActiveJobSheet")
     write_to_sheet("ActiveJobSheet!A1:B1", [["Timestamp", "Requirements JSON"]])
     
-    ensure_sheet_exists("HRQuestions")
-    # UPDATED HEADER: Added Date and Resume Link
-    write_to_sheet("HRQuestions!A1:E1", [["Date", "Candidate Name", "Job", "Resume Link", "Questions"]])
+    # UPDATED HEADER: Added Date and Resume Link (skipped if already written recently)
+    ensure_sheet_exists("HRQuestions", ["Date", "Candidate Name", "Job", "Resume Link", "Questions"])
 
     # Fetch ALL JDs into a map
     from services.sheets import get_all_job_descriptions
@@ -552,6 +738,9 @@ def trigger_sync(background_tasks: BackgroundTasks, job_filter: Optional[str] =
         # Load processed candidates (to avoid re-analyzing)
         analysis_sheet_target = f"Analysis - {job_filter}"
         ensure_sheet_exists(analysis_sheet_target, ["Candidate Name", "Match Score", "Strengths", "Weaknesses", "Experience Check", "Skill Match", "Verdict", "Timestamp", "Job Applied For"])
+        # Analysis rows from a recent run may still sit in the append buffer: write them out first
+        from services.sheet_writer import flush_appends
+        flush_appends()
         processed_rows = read_sheet(f"{analysis_sheet_target}!A:A")
         if processed_rows and len(processed_rows) > 1:
              processed_names = {r[0] for r in processed_rows[1:]}
@@ -736,7 +925,8 @@ def get_candidates(job_title: Optional[str] = None, start_date: Optional[str] =
     
     ensure_sheet_exists(target_sheet, ANALYSIS_HEADERS)
     
-    rows = read_sheet(f"{target_sheet}!A:K")
+    # Served from the local replica (see services/sheet_replica.py)
+    rows = read_sheet_replica(f"{target_sheet}!A:K")
     if not rows: return []
     
     # --- HYDRATION LOGIC START ---
@@ -828,12 +1018,10 @@ def get_imported_candidates(job_title: str, start_date: Optional[str] = None, en
     """
     Fetch RAW imported candidates from source sheet (not analyzed).
     """
-    from services.sheets import read_sheet
-    
     source_sheet = f"{job_title}"
     
     try:
-        rows = read_sheet(f"{source_sheet}!A:D")
+        rows = read_sheet_replica(f"{source_sheet}!A:D")
         
         if not rows or len(rows) < 2:
             return []
@@ -885,7 +1073,7 @@ def get_imported_candidates(job_title: str, start_date: Optional[str] = None, en
 @router.get("/questions/{candidate_name}")
 def get_questions(candidate_name: str):
     ensure_sheet_exists("HRQuestions", ["Date", "Candidate Name", "Job", "Resume Link", "Questions"])
-    rows = read_sheet("HRQuestions!A:E")
+    rows = read_sheet_replica("HRQuestions!A:E")
 
     if not rows: return {"questions": []}
     
@@ -2,7 +2,8 @@ from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any
 from services.sheets import read_sheet, get_all_job_titles, get_source_sheet_name, ensure_sheet_exists
 # NEW import
-from services.sheets import get_all_sheet_titles, batch_read_sheets
+from services.sheets import get_all_sheet_titles
+from services.sheet_replica import read_sheet_replica, batch_read_replica
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -10,11 +11,12 @@ router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 def get_dashboard_stats():
     """
     Returns aggregated statistics for the dashboard.
-    Optimized to use BATCH fetching (2 API calls total instead of 2N+1).
+    Optimized to use BATCH fetching (2 API calls total instead of 2N+1),
+    served from the local replica when it is fresh (usually 0 API calls).
     Now robust: Checks if sheets exist before requesting them.
     """
     try:
-        job_titles = get_all_job_titles()
+        job_titles = get_all_job_titles(read_fn=read_sheet_replica)
         sheet_titles = get_all_sheet_titles()
         existing_sheets_set = set(sheet_titles)
         
@@ -54,7 +56,7 @@ def get_dashboard_stats():
         # Execute Batch Read
         batch_results = {}
         if ranges:
-            batch_results = batch_read_sheets(ranges)
+            batch_results = batch_read_replica(ranges)
         
         total_received = 0
         total_processed = 0
@@ -119,3 +121,37 @@ def get_dashboard_stats():
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/metrics")
+def get_system_metrics():
+    """
+    Internal performance counters (connection reuse, caches, etc.) for tuning.
+    """
+    from services.google_clients import get_client_stats
+    from services.sheet_writer import append_buffer
+    from services.sheet_replica import get_replica
+    from services.candidate_index import get_index_stats
+    from services.audio_preprocess import get_preprocess_stats
+    from services.resume_cache import get_resume_cache
+    from services.text_extraction import get_extraction_stats
+    from services.resume_text_store import get_resume_text_store
+    from services.llm import get_key_pool, get_http_pool_stats
+    from services.llm_cache import get_llm_cache
+    from services.batch_planner import get_batch_planner
+    replica = get_replica()
+    resume_cache = get_resume_cache()
+    llm_cache = get_llm_cache()
+    return {
+        "google_clients": get_client_stats(),
+        "sheet_append_buffer": append_buffer.get_stats(),
+        "sheet_replica": replica.get_stats() if replica else None,
+        "candidate_index": get_index_stats(),
+        "interview_audio": get_preprocess_stats(),
+        "resume_cache": resume_cache.get_stats() if resume_cache else None,
+        "text_extraction": get_extraction_stats(),
+        "resume_text_store": get_resume_text_store().get_stats(),
+        "llm_keys": get_key_pool().get_stats(),
+        "llm_http_pool": get_http_pool_stats(),
+        "llm_response_cache": llm_cache.get_stats() if llm_cache else None,
+        "llm_batching": get_batch_planner().get_stats()
+    }
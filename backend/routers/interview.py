@@ -1,10 +1,16 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from starlette.concurrency import iterate_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+from collections import OrderedDict
 import os
-import shutil
-import tempfile
+import json
+import threading
+import time
 from services.llm import get_llm
+from services.interview_grading import enqueue_grading, get_grading_status, VOICE_INTERVIEW_HEADERS
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from openai import OpenAI
@@ -12,134 +18,61 @@ from openai import OpenAI
 # Initialize Router
 router = APIRouter()
 
+_GROQ_CLIENT = None
+
 # Initialize Groq Client for STT (Speech to Text)
 # We use the OpenAI client compatible with Groq's API
 def get_groq_audio_client():
+    global _GROQ_CLIENT
+    if _GROQ_CLIENT is not None:
+        return _GROQ_CLIENT
+
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         print("⚠️ GROQ_API_KEY not found. STT will fail.")
         return None
     
-    return OpenAI(
+    # Built once per process: keeps its HTTP connection pool alive between turns
+    _GROQ_CLIENT = OpenAI(
         api_key=api_key,
         base_url="https://api.groq.com/openai/v1"
     )
+    return _GROQ_CLIENT
 
-@router.post("/process")
-async def process_interview_audio(
-    audio: UploadFile = File(...),
-    candidate_email: str = Form(...),
-
-    job_title: str = Form(...),
-    history: str = Form(default="") # Simple history string passed from frontend
-):
-    try:
-        # 1. Save Audio Temporarily
-        suffix = os.path.splitext(audio.filename)[1] or ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(audio.file, tmp)
-            tmp_path = tmp.name
-        
-        # 2. Transcribe (STT) via Groq
-        client = get_groq_audio_client()
-        if not client:
-            return {"error": "Server configuration error (Missing API Key)"}
-        
-        # DEBUG: Check file size
-        file_size = os.path.getsize(tmp_path)
-        print(f"🎤 Audio File Size: {file_size} bytes")
-        
-        if file_size < 100:
-            print("⚠️ Audio file is too small (silent/empty).")
-            return {
-                "transcript": "",
-                "response": "I didn't catch that. It seems the audio was empty.",
-                "is_success": False
-            }
-
-        with open(tmp_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(tmp_path, file.read()),
-                model="whisper-large-v3",
-                prompt="The candidate is speaking during a job interview. They are introducing themselves and discussing their qualifications.",
-                response_format="json",
-                language="en",
-                temperature=0.0
-            )
-
-
-        
-        user_text = transcription.text.strip()
-        print(f"🗣️ Raw Transcription Result: '{user_text}'")
-        
-        # Hallucination Filter (Whisper often outputs 'you' or 'Thank you' on silence)
-        hallucinations = [
-            "you", "thank you", "thanks for watching", "subtitles by",
-            "they are introducing themselves and discussing their qualifications",
-            "the job interview is a very important part of the job interview process",
-            "hello everyone", "my name is", "i am a", "hello"
-        ]
+# Local Stub Backends
+# INTERVIEW_STUB_BACKENDS=1 swaps Groq STT and the interviewer LLM for local stand-ins so the
+# HTTP/SSE/WebSocket interview flows can be exercised without API keys:
+# - STT "transcribes" the audio bytes by decoding them as UTF-8 text
+#   (clips still have to pass the MIN_AUDIO_BYTES size check).
+# - The LLM replays INTERVIEW_STUB_REPLIES (streamed char by char), ending the interview.
+STUB_BACKENDS = os.getenv("INTERVIEW_STUB_BACKENDS", "0") == "1"
+INTERVIEW_STUB_REPLIES = [
+    "Thanks for that. Can you tell me about a recent project you are proud of?",
+    "Thank you for your time. We will be in touch. <END_INTERVIEW>"
+]
 
-        
-        # Remove all punctuation for check
-        import string
-        cleaned_text = user_text.lower().translate(str.maketrans('', '', string.punctuation)).strip()
-        
-        if not user_text or len(cleaned_text) < 2 or cleaned_text in hallucinations:
-            print(f"⚠️ Detected Silence/Hallucination: '{user_text}' -> Treat as empty.")
-            return {
-                "transcript": "",
-                "response": "I couldn't hear you clearly. Could you please repeat that?",
-                "is_success": False
-            }
+def _stub_transcribe(audio_bytes: bytes, filename: str) -> str:
+    return audio_bytes.decode("utf-8", errors="ignore").strip()
 
+def get_stt_backend():
+    """Returns transcribe(audio_bytes, filename) -> str, or None if STT isn't configured."""
+    if STUB_BACKENDS:
+        return _stub_transcribe
+    client = get_groq_audio_client()
+    if not client:
+        return None
+    return lambda audio_bytes, filename: transcribe_audio(client, audio_bytes, filename)
 
-        
-        # Cleanup temp file
-        os.remove(tmp_path)
+def get_interviewer_llm():
+    if STUB_BACKENDS:
+        from langchain_core.language_models.fake import FakeStreamingListLLM
+        return FakeStreamingListLLM(responses=INTERVIEW_STUB_REPLIES)
+    return get_llm(cache=False)  # Live conversation: never replay a cached turn
 
-        # 3. Generate AI Response
-        import datetime
-        from services.sheets import append_to_sheet, ensure_sheet_exists, get_candidate_name_by_email, get_questions_by_name
-        
-        # 1. Fetch Target Questions (if available)
-        target_questions = None
-        candidate_name = get_candidate_name_by_email(job_title, candidate_email)
-        if candidate_name:
-            target_questions = get_questions_by_name(job_title, candidate_name)
-            
-        print(f"📋 Target Questions Found: {bool(target_questions)}")
-
-        # --- IMMEDIATE DISQUALIFICATION CHECK ---
-        if "SYSTEM: CANDIDATE DISQUALIFIED" in history:
-            print("🚨 Candidate Disqualified (Cheating Detected). Forcing FAIL.")
-            
-            # Save FAIL to Sheet
-            ensure_sheet_exists("VoiceInterviews", headers=["Date", "Candidate Email", "Job Title", "Score", "Verdict", "Feedback", "Transcript Link"])
-            row = [
-                datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                candidate_email,
-                job_title,
-                0,        # Score
-                "FAIL",   # Verdict
-                "DISQUALIFIED: Cheating detected (Tab Switching/Suspicious Activity).", # Feedback
-                "See App Logs"
-            ]
-            append_to_sheet("VoiceInterviews!A:G", [row])
-            
-            return {
-                "transcript": "",
-                "response": "Interview Terminated.",
-                "is_success": True,
-                "is_terminated": True
-            }
-        # ----------------------------------------
-
-        # Enhanced Prompt ensuring Agent Control
-        if target_questions:
-            # STRICT MODE: Ask specific questions
-            INTERVIEWER_PROMPT = f"""You are an expert AI Recruiter conducting a voice interview for the role of "{{job_title}}".
-            Candidate Name: {candidate_name or 'Unknown'}
+# Enhanced Prompt ensuring Agent Control
+# STRICT MODE: Ask specific questions ({candidate_name} / {target_questions} are filled per session)
+TARGETED_INTERVIEWER_PROMPT = """You are an expert AI Recruiter conducting a voice interview for the role of "{{job_title}}".
+            Candidate Name: {candidate_name}
             
             GOAL: You have a REQUIRED list of questions generated specifically for this candidate based on their resume.
             
@@ -168,9 +101,9 @@ async def process_interview_audio(
             - Keep spoken responses short.
             - No markdown.
             """
-        else:
-            # FALLBACK MODE (Generic)
-            INTERVIEWER_PROMPT = """You are an expert AI Recruiter conducting a voice interview for the role of "{job_title}".
+
+# FALLBACK MODE (Generic)
+GENERIC_INTERVIEWER_PROMPT = """You are an expert AI Recruiter conducting a voice interview for the role of "{job_title}".
             
             GOAL: Assess the candidate's core skills in a concise manner (approx 3 questions).
             
@@ -195,89 +128,481 @@ async def process_interview_audio(
             - Keep spoken responses short (2-4 sentences).
             - No markdown.
             """
+
+# Interview Session Cache
+# One interview = many HTTP turns. Everything that doesn't change between turns
+# (candidate name, target questions, rendered prompt) is resolved ONCE on the first turn
+# and kept here, keyed by (candidate_email, job_title). The LLM client is NOT pinned: each
+# turn asks the key pool again, so a rate-limited key doesn't stall the whole interview.
+SESSION_TTL_SECONDS = int(os.getenv("INTERVIEW_SESSION_TTL_SECONDS", "7200"))
+MAX_SESSIONS = int(os.getenv("INTERVIEW_MAX_SESSIONS", "200"))
+
+class InterviewSession:
+    def __init__(self, candidate_email: str, job_title: str):
+        from services.sheets import get_candidate_name_by_email, get_questions_by_name
+
+        self.candidate_email = candidate_email
+        self.job_title = job_title
+
+        # 1. Fetch Target Questions (if available)
+        self.target_questions = None
+        self.candidate_name = get_candidate_name_by_email(job_title, candidate_email)
+        if self.candidate_name:
+            self.target_questions = get_questions_by_name(job_title, self.candidate_name)
+        print(f"📋 Target Questions Found: {bool(self.target_questions)}")
+
+        if self.target_questions:
+            template = TARGETED_INTERVIEWER_PROMPT.format(
+                candidate_name=self.candidate_name or 'Unknown',
+                target_questions=self.target_questions
+            )
+        else:
+            template = GENERIC_INTERVIEWER_PROMPT
+
+        self.prompt = PromptTemplate(template=template, input_variables=["job_title", "history", "user_input"])
+        # Stub replies are scripted per session; real turns take a client per turn (see chain())
+        self._stub_llm = get_interviewer_llm() if STUB_BACKENDS else None
+
+        self.turns = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def chain(self):
+        """
+        Prompt -> LLM -> text for ONE turn. The client is fetched per turn so every turn goes to the
+        key pool's least-loaded healthy key (clients are memoized, so this is cheap).
+        """
+        return self.prompt | (self._stub_llm or get_interviewer_llm()) | StrOutputParser()
+
+# Audio Ingestion
+# Turns are short webm clips: read straight into memory (Starlette already spools big
+# uploads to disk) instead of copying to a NamedTemporaryFile and reading it back.
+MIN_AUDIO_BYTES = 100
+MAX_AUDIO_BYTES = int(os.getenv("INTERVIEW_MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))  # Groq STT upload limit
+AUDIO_READ_CHUNK = 64 * 1024
+
+async def read_upload_audio(audio: UploadFile) -> bytes:
+    """Reads the upload in chunks, refusing anything over MAX_AUDIO_BYTES."""
+    buf = bytearray()
+    while True:
+        chunk = await audio.read(AUDIO_READ_CHUNK)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if len(buf) > MAX_AUDIO_BYTES:
+            raise HTTPException(status_code=413, detail=f"Audio too large (max {MAX_AUDIO_BYTES} bytes)")
+    return bytes(buf)
+
+_SESSIONS = OrderedDict()  # (email, job) -> InterviewSession, oldest first
+_SESSIONS_LOCK = threading.Lock()
+
+def get_interview_session(candidate_email: str, job_title: str) -> InterviewSession:
+    key = (candidate_email.lower().strip(), job_title.strip())
+    now = time.time()
+    with _SESSIONS_LOCK:
+        # Evict expired sessions (TTL)
+        for k in [k for k, s in _SESSIONS.items() if now - s.last_used > SESSION_TTL_SECONDS]:
+            del _SESSIONS[k]
+        session = _SESSIONS.get(key)
+        if session is not None:
+            _SESSIONS.move_to_end(key)
+            session.last_used = now
+            return session
+
+    # Build outside the lock (Sheets lookups)
+    session = InterviewSession(candidate_email, job_title)
+    with _SESSIONS_LOCK:
+        existing = _SESSIONS.get(key)
+        if existing is not None:
+            return existing
+        _SESSIONS[key] = session
+        # Evict least recently used (LRU)
+        while len(_SESSIONS) > MAX_SESSIONS:
+            _SESSIONS.popitem(last=False)
+    return session
+
+def end_interview_session(candidate_email: str, job_title: str):
+    with _SESSIONS_LOCK:
+        _SESSIONS.pop((candidate_email.lower().strip(), job_title.strip()), None)
+
+STT_PROMPT = "The candidate is speaking during a job interview. They are introducing themselves and discussing their qualifications."
+
+# Hallucination Filter (Whisper often outputs 'you' or 'Thank you' on silence)
+HALLUCINATIONS = [
+    "you", "thank you", "thanks for watching", "subtitles by",
+    "they are introducing themselves and discussing their qualifications",
+    "the job interview is a very important part of the job interview process",
+    "hello everyone", "my name is", "i am a", "hello"
+]
+
+END_TOKEN = "<END_INTERVIEW>"
+TERMINATION_PHRASES = ["thank you for your time", "we will be in touch", "end of the interview"]
+
+EMPTY_AUDIO_RESULT = {
+    "transcript": "",
+    "response": "I didn't catch that. It seems the audio was empty.",
+    "is_success": False
+}
+UNCLEAR_AUDIO_RESULT = {
+    "transcript": "",
+    "response": "I couldn't hear you clearly. Could you please repeat that?",
+    "is_success": False
+}
+
+def is_silence_or_hallucination(user_text: str) -> bool:
+    # Remove all punctuation for check
+    import string
+    cleaned_text = user_text.lower().translate(str.maketrans('', '', string.punctuation)).strip()
+    return not user_text or len(cleaned_text) < 2 or cleaned_text in HALLUCINATIONS
+
+def transcribe_audio(client, audio_bytes: bytes, filename: str) -> str:
+    transcription = client.audio.transcriptions.create(
+        file=(filename, audio_bytes),
+        model="whisper-large-v3",
+        prompt=STT_PROMPT,
+        response_format="json",
+        language="en",
+        temperature=0.0
+    )
+    user_text = transcription.text.strip()
+    print(f"🗣️ Raw Transcription Result: '{user_text}'")
+    return user_text
+
+async def transcribe_bytes(audio_bytes: bytes, filename: str):
+    """
+    Step 2 of a turn: transcribe + filter (shared by HTTP, SSE and WebSocket modes).
+    Returns (user_text, None) or ("", early_result) when the turn should stop here.
+    """
+    # 2. Transcribe (STT) via Groq
+    transcribe = get_stt_backend()
+    if not transcribe:
+        return "", {"error": "Server configuration error (Missing API Key)"}
+    
+    # DEBUG: Check file size
+    file_size = len(audio_bytes)
+    print(f"🎤 Audio File Size: {file_size} bytes")
+    
+    if file_size < MIN_AUDIO_BYTES:
+        print("⚠️ Audio file is too small (silent/empty).")
+        return "", dict(EMPTY_AUDIO_RESULT)
+
+    # Decode + VAD trim + 16 kHz mono (CPU-bound -> threadpool). Stub STT needs the raw bytes.
+    if not STUB_BACKENDS:
+        from services.audio_preprocess import preprocess_audio
+        audio_bytes, filename, audio_stats = await run_in_threadpool(preprocess_audio, audio_bytes, filename)
+        print(f"🎚️ Audio Preprocess: {audio_stats}")
+        if audio_bytes is None:
+            print("⚠️ No speech detected in audio. Skipping STT.")
+            return "", {**EMPTY_AUDIO_RESULT, "audio_stats": audio_stats}
+
+    # Blocking HTTP call -> keep it off the event loop
+    user_text = await run_in_threadpool(transcribe, audio_bytes, filename)
+    
+    if is_silence_or_hallucination(user_text):
+        print(f"⚠️ Detected Silence/Hallucination: '{user_text}' -> Treat as empty.")
+        return "", dict(UNCLEAR_AUDIO_RESULT)
+    return user_text, None
+
+async def transcribe_upload(audio: UploadFile):
+    """Steps 1-2 of a turn for multipart uploads: read + transcribe + filter."""
+    # 1. Read Audio (in memory, no temp file)
+    suffix = os.path.splitext(audio.filename or "")[1] or ".webm"
+    audio_bytes = await read_upload_audio(audio)
+    return await transcribe_bytes(audio_bytes, f"audio{suffix}")
+
+def start_turn(candidate_email: str, job_title: str, history: str):
+    """
+    Step 3 prelude: fetch the cached session and handle disqualification.
+    Returns (session, None) or (None, early_result).
+    """
+    import datetime
+    from services.sheets import ensure_sheet_exists
+    from services.sheet_writer import buffered_append
+    
+    # Name / target questions / prompt are resolved once per interview (first turn only)
+    session = get_interview_session(candidate_email, job_title)
+    session.turns += 1
+
+    # --- IMMEDIATE DISQUALIFICATION CHECK ---
+    if "SYSTEM: CANDIDATE DISQUALIFIED" in history:
+        print("🚨 Candidate Disqualified (Cheating Detected). Forcing FAIL.")
         
-        llm = get_llm()
-        chain = PromptTemplate(template=INTERVIEWER_PROMPT, input_variables=["job_title", "history", "user_input"]) | llm | StrOutputParser()
-        
-        ai_response = chain.invoke({
-            "job_title": job_title,
-            "history": history,
-            "user_input": user_text
-        })
-        
-        # Check for Termination Token OR Standard Phrases (Fallback)
-        is_terminated = "<END_INTERVIEW>" in ai_response
-        clean_response = ai_response.replace("<END_INTERVIEW>", "").strip()
-        
-        # Robust Fallback: If agent said goodbye but forgot token
-        termination_phrases = ["thank you for your time", "we will be in touch", "end of the interview"]
-        if not is_terminated:
-            for phrase in termination_phrases:
-                if phrase.lower() in clean_response.lower():
-                    is_terminated = True
-                    print(f"⚠️ Termination Phrase Detected: '{phrase}'. Forcing Termination.")
-                    break
-        
-        print(f"🤖 Agent Response: {clean_response} (Terminated: {is_terminated})")
+        # Save FAIL to Sheet
+        ensure_sheet_exists("VoiceInterviews", headers=VOICE_INTERVIEW_HEADERS)
+        row = [
+            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            candidate_email,
+            job_title,
+            0,        # Score
+            "FAIL",   # Verdict
+            "DISQUALIFIED: Cheating detected (Tab Switching/Suspicious Activity).", # Feedback
+            "See App Logs"
+        ]
+        buffered_append("VoiceInterviews!A:G", [row])
+        end_interview_session(candidate_email, job_title)
         
-        # 4. Grading & Persistence (If Terminated)
-        grading_data = {}
-        if is_terminated:
-            print("📝 Interview Finished. Grading Candidate...")
-            try:
-                # 4a. Grade the specific interview session
-                GRADING_PROMPT = """You are a Senior Hiring Manager. Grade this interview transcript for a {job_title} role.
-                
-                Transcript:
-                {history}
-                Candidate: {user_input}
-                
-                Return JSON ONLY:
-                {{
-                    "score": "0-10",
-                    "verdict": "PASS or FAIL",
-                    "feedback": "1 short sentence summary"
-                }}
-                """
-                
-                grade_chain = PromptTemplate(template=GRADING_PROMPT, input_variables=["job_title", "history", "user_input"]) | llm | StrOutputParser()
-                grade_json = grade_chain.invoke({"job_title": job_title, "history": history, "user_input": user_text})
-                
-                # Simple parsing (robustness would rely on structured output parser, doing manual clean for now)
-                import json
-                try:
-                    # Clean potential markdown code blocks
-                    grade_str = grade_json.replace("```json", "").replace("```", "").strip()
-                    grades = json.loads(grade_str)
-                except:
-                    grades = {"score": "N/A", "verdict": "REVIEW", "feedback": "Parsing error"}
-                
-                # 4b. Save to Sheets
-                ensure_sheet_exists("VoiceInterviews", headers=["Date", "Candidate Email", "Job Title", "Score", "Verdict", "Feedback", "Transcript Link"])
-                
-                # We save a summary. Ideally we'd save full text but it's long. Saving 'history' context.
-                row = [
-                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    candidate_email,
-                    job_title,
-                    grades.get("score"),
-                    grades.get("verdict"),
-                    grades.get("feedback"),
-                    "See App Logs" # Placeholder for full transcript URL if we had blob storage
-                ]
-                append_to_sheet("VoiceInterviews!A:G", [row])
-                print(f"✅ Saved Interview Results: {grades}")
-                
-            except Exception as e:
-                print(f"❌ Grading/Save Error: {e}")
-
-        return {
-            "transcript": user_text,
-            "response": clean_response,
+        return None, {
+            "transcript": "",
+            "response": "Interview Terminated.",
             "is_success": True,
-            "is_terminated": is_terminated
+            "is_terminated": True
         }
+    return session, None
+
+def finish_turn(session: InterviewSession, history: str, user_text: str, ai_response: str) -> dict:
+    """Step 4: termination detection + (queued) grading. Returns the turn result."""
+    # Check for Termination Token OR Standard Phrases (Fallback)
+    is_terminated = END_TOKEN in ai_response
+    clean_response = ai_response.replace(END_TOKEN, "").strip()
+    
+    # Robust Fallback: If agent said goodbye but forgot token
+    if not is_terminated:
+        for phrase in TERMINATION_PHRASES:
+            if phrase.lower() in clean_response.lower():
+                is_terminated = True
+                print(f"⚠️ Termination Phrase Detected: '{phrase}'. Forcing Termination.")
+                break
+    
+    print(f"🤖 Agent Response: {clean_response} (Terminated: {is_terminated}, Turn: {session.turns})")
+    
+    candidate_email, job_title = session.candidate_email, session.job_title
+
+    # Grading & Persistence (If Terminated)
+    # Runs as a durable background job so the goodbye returns as fast as any other turn
+    grading_job_id = None
+    if is_terminated:
+        print("📝 Interview Finished. Queuing grading...")
+        end_interview_session(candidate_email, job_title)
+        try:
+            grading_job_id = enqueue_grading(candidate_email, job_title, history, user_text)
+        except Exception as e:
+            print(f"❌ Grading Queue Error: {e}")
+
+    result = {
+        "transcript": user_text,
+        "response": clean_response,
+        "is_success": True,
+        "is_terminated": is_terminated
+    }
+    if grading_job_id:
+        result["grading_job_id"] = grading_job_id
+    return result
+
+def run_turn(candidate_email: str, job_title: str, history: str, user_text: str) -> dict:
+    """Step 3-4 (blocking): full interviewer reply in one LLM call."""
+    session, early = start_turn(candidate_email, job_title, history)
+    if early:
+        return early
+
+    # 3. Generate AI Response
+    ai_response = session.chain().invoke({
+        "job_title": job_title,
+        "history": history,
+        "user_input": user_text
+    })
+    return finish_turn(session, history, user_text, ai_response)
+
+@router.post("/process")
+async def process_interview_audio(
+    audio: UploadFile = File(...),
+    candidate_email: str = Form(...),
+
+    job_title: str = Form(...),
+    history: str = Form(default="") # Simple history string passed from frontend
+):
+    try:
+        user_text, early = await transcribe_upload(audio)
+        if early:
+            return early
+
+        return await run_in_threadpool(run_turn, candidate_email, job_title, history, user_text)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error in voice processing: {e}")
         return {"error": str(e), "transcript": "", "response": "Sorry, I encountered an error processing your audio."}
+    finally:
+        # Releases Starlette's spooled upload file on EVERY path (early returns included)
+        await audio.close()
+
+# Streaming (SSE) Variant
+# Same turn as /process, but the transcript is sent as soon as STT finishes and the
+# interviewer reply is streamed token by token so TTS can start on the first words.
+# Events: transcript -> token* -> done (same payload as /process) | error
+
+class EndTokenFilter:
+    """
+    Strips <END_INTERVIEW> from a token stream. Text that could be the start of the
+    token is held back until the next chunk proves otherwise.
+    """
+
+    def __init__(self, token: str = END_TOKEN):
+        self.token = token
+        self.pending = ""
+        self.terminated = False
+
+    def feed(self, chunk: str) -> str:
+        if self.terminated:
+            return ""
+        self.pending += chunk
+        idx = self.pending.find(self.token)
+        if idx != -1:
+            self.terminated = True
+            out, self.pending = self.pending[:idx], ""
+            return out
+        # Hold back the longest suffix that is a prefix of the token
+        keep = 0
+        for n in range(min(len(self.token) - 1, len(self.pending)), 0, -1):
+            if self.token.startswith(self.pending[-n:]):
+                keep = n
+                break
+        out = self.pending[:len(self.pending) - keep]
+        self.pending = self.pending[len(self.pending) - keep:]
+        return out
+
+    def flush(self) -> str:
+        out, self.pending = self.pending, ""
+        return "" if self.terminated else out
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def turn_events(candidate_email: str, job_title: str, history: str, user_text: str):
+    """
+    Sync generator of (event, payload) for one streamed turn:
+    transcript -> token* -> done | error. Transport-agnostic (SSE and WebSocket).
+    """
+    yield "transcript", {"transcript": user_text}
+    try:
+        session, early = start_turn(candidate_email, job_title, history)
+        if early:
+            yield "done", early
+            return
+
+        end_filter = EndTokenFilter()
+        parts = []
+        for chunk in session.chain().stream({
+            "job_title": job_title,
+            "history": history,
+            "user_input": user_text
+        }):
+            parts.append(chunk)
+            text = end_filter.feed(chunk)
+            if text:
+                yield "token", {"text": text}
+            if end_filter.terminated:
+                break  # Nothing after the token is spoken
+        tail = end_filter.flush()
+        if tail:
+            yield "token", {"text": tail}
+
+        yield "done", finish_turn(session, history, user_text, "".join(parts))
+    except Exception as e:
+        print(f"❌ Error in streaming voice processing: {e}")
+        yield "error", {"error": str(e), "response": "Sorry, I encountered an error processing your audio."}
+
+def stream_turn(candidate_email: str, job_title: str, history: str, user_text: str):
+    """Sync generator of SSE frames (Starlette iterates it in a worker thread)."""
+    for event, payload in turn_events(candidate_email, job_title, history, user_text):
+        yield sse_event(event, payload)
+
+@router.post("/process/stream")
+async def process_interview_audio_stream(
+    audio: UploadFile = File(...),
+    candidate_email: str = Form(...),
+    job_title: str = Form(...),
+    history: str = Form(default="")
+):
+    try:
+        user_text, early = await transcribe_upload(audio)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error in voice processing: {e}")
+        user_text, early = "", {"error": str(e), "transcript": "", "response": "Sorry, I encountered an error processing your audio."}
+    finally:
+        await audio.close()
+
+    if early:
+        events = iter([sse_event("done", early)])
+    else:
+        events = stream_turn(candidate_email, job_title, history, user_text)
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# WebSocket (Full-Duplex) Mode
+# One socket per interview instead of one multipart upload per turn:
+#   client -> binary frames: audio chunks while the candidate speaks (buffered per socket)
+#   client -> {"type": "end_of_speech", "history": "...", "format": ".webm"}: run the turn
+#   client -> {"type": "reset"}: drop the buffered audio
+#   server -> {"type": "transcript" | "token" | "done" | "error", ...} (same payloads as SSE)
+# Audio upload overlaps with speaking, so only STT + LLM remain after end-of-speech.
+
+@router.websocket("/ws")
+async def interview_websocket(websocket: WebSocket, candidate_email: str, job_title: str):
+    await websocket.accept()
+    audio_buf = bytearray()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                audio_buf.extend(message["bytes"])
+                if len(audio_buf) > MAX_AUDIO_BYTES:
+                    audio_buf.clear()
+                    await websocket.send_json({"type": "error", "error": f"Audio too large (max {MAX_AUDIO_BYTES} bytes)"})
+                continue
+
+            try:
+                data = json.loads(message.get("text") or "{}")
+            except ValueError:
+                await websocket.send_json({"type": "error", "error": "Invalid control message"})
+                continue
+
+            kind = data.get("type")
+            if kind == "reset":
+                audio_buf.clear()
+                continue
+            if kind != "end_of_speech":
+                await websocket.send_json({"type": "error", "error": f"Unknown message type: {kind}"})
+                continue
+
+            audio_bytes = bytes(audio_buf)
+            audio_buf.clear()
+            history = data.get("history", "")
+            suffix = data.get("format") or ".webm"
+
+            try:
+                user_text, early = await transcribe_bytes(audio_bytes, f"audio{suffix}")
+            except Exception as e:
+                print(f"❌ Error in voice processing: {e}")
+                user_text, early = "", {"error": str(e), "transcript": "", "response": "Sorry, I encountered an error processing your audio."}
+            if early:
+                await websocket.send_json({"type": "done", **early})
+                continue
+
+            terminated = False
+            async for event, payload in iterate_in_threadpool(turn_events(candidate_email, job_title, history, user_text)):
+                await websocket.send_json({"type": event, **payload})
+                if event == "done" and payload.get("is_terminated"):
+                    terminated = True
+            if terminated:
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        print(f"🔌 Interview socket closed by client ({candidate_email})")
+
+@router.get("/grading/{job_id}")
+def get_interview_grading(job_id: str):
+    """Status of a background grading job (queued / running / done / failed)."""
+    status = get_grading_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    return status
@@ -0,0 +1,181 @@
+import os
+import time
+import shutil
+import threading
+import subprocess
+
+# Audio Preprocessing for Interview STT
+# The browser's webm recording used to go to Whisper untouched, leading/trailing silence included
+# (which is also where the "thank you" hallucinations come from). Before STT we now:
+#   1. Decode the clip to 16 kHz mono PCM (ffmpeg does the decode + resample in one pass)
+#   2. Run an energy-based VAD over 30ms frames (NumPy)
+#   3. Reject clips with no speech at all -> no paid STT call for empty turns
+#   4. Trim the silence around the speech (with a little padding) and re-encode as Ogg/Opus
+#      (raw PCM piped straight into ffmpeg; speech-tuned Opus at 16 kHz is smaller than the
+#      browser's webm, unlike lossless FLAC which was usually larger and so never got used)
+# If NumPy or ffmpeg isn't available, or decoding fails, the original bytes are sent as before.
+
+PREPROCESS_ENABLED = os.getenv("INTERVIEW_AUDIO_PREPROCESS", "1") != "0"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+DECODE_TIMEOUT_SECONDS = 15
+OPUS_BITRATE = os.getenv("INTERVIEW_OPUS_BITRATE", "24k")  # Plenty for 16 kHz speech
+
+TARGET_SAMPLE_RATE = 16000  # What Whisper works at internally anyway
+FRAME_MS = 30
+PAD_MS = 200                # Kept around the speech so word onsets/endings aren't clipped
+MIN_SPEECH_MS = 250         # Less voiced audio than this = silence
+ABS_THRESHOLD_DB = -45.0    # Frames quieter than this are never speech
+NOISE_MARGIN_DB = 12.0      # Speech must also be this far above the clip's noise floor
+
+_STATS = {
+    "clips": 0,
+    "rejected_silent": 0,
+    "passthrough": 0,        # Not processed (deps missing / decode error / no gain)
+    "input_bytes": 0,
+    "output_bytes": 0,
+    "input_audio_ms": 0.0,
+    "output_audio_ms": 0.0,
+    "total_preprocess_ms": 0.0,
+}
+_STATS_LOCK = threading.Lock()
+_WARNED = False
+
+
+def _available() -> bool:
+    global _WARNED
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        numpy = None
+    ok = numpy is not None and shutil.which(FFMPEG_BIN) is not None
+    if not ok and not _WARNED:
+        print("⚠️ Audio preprocessing disabled (needs numpy + ffmpeg). Sending raw audio to STT.")
+        _WARNED = True
+    return ok
+
+
+def _ffmpeg(args: list, data: bytes) -> bytes:
+    proc = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", *args],
+        input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=DECODE_TIMEOUT_SECONDS
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode("utf-8", errors="ignore").strip()[:300])
+    return proc.stdout
+
+
+def decode_to_pcm(audio_bytes: bytes):
+    """Any container ffmpeg understands -> float32 numpy array, 16 kHz mono, range [-1, 1]."""
+    import numpy as np
+    raw = _ffmpeg(["-i", "pipe:0", "-f", "s16le", "-acodec", "pcm_s16le",
+                   "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "pipe:1"], audio_bytes)
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def detect_speech(samples, sample_rate: int = TARGET_SAMPLE_RATE):
+    """
+    Energy VAD. Returns (start_sample, end_sample, speech_ms); (0, 0, 0) when there's no speech.
+    Threshold = max(absolute floor, noise floor + margin), noise floor = 10th percentile frame energy.
+    """
+    import numpy as np
+    frame_len = int(sample_rate * FRAME_MS / 1000)
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return 0, 0, 0
+
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    energy_db = 20 * np.log10(rms)
+
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(ABS_THRESHOLD_DB, noise_floor + NOISE_MARGIN_DB)
+    voiced = energy_db > threshold
+
+    speech_ms = int(voiced.sum()) * FRAME_MS
+    if speech_ms < MIN_SPEECH_MS:
+        return 0, 0, speech_ms
+
+    idx = np.flatnonzero(voiced)
+    pad = int(PAD_MS / FRAME_MS)
+    start = max(int(idx[0]) - pad, 0) * frame_len
+    end = min(int(idx[-1]) + 1 + pad, n_frames) * frame_len
+    return start, end, speech_ms
+
+
+def encode_opus(samples, sample_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """float32 PCM -> Ogg/Opus bytes (speech mode, accepted by Groq STT). PCM goes in raw, no WAV step."""
+    import numpy as np
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    return _ffmpeg(["-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+                    "-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip",
+                    "-f", "ogg", "pipe:1"], pcm.tobytes())
+
+
+def preprocess_audio(audio_bytes: bytes, filename: str):
+    """
+    Returns (audio_bytes, filename, stats). audio_bytes is None when the clip has no speech
+    (caller should skip STT). Otherwise it's the trimmed Ogg/Opus clip, or the original clip if
+    preprocessing isn't possible / wouldn't make the upload smaller.
+    """
+    start_time = time.perf_counter()
+    stats = {"input_bytes": len(audio_bytes), "output_bytes": len(audio_bytes), "processed": False}
+
+    if not PREPROCESS_ENABLED or not _available():
+        return _finish(audio_bytes, filename, stats, start_time)
+
+    try:
+        samples = decode_to_pcm(audio_bytes)
+    except Exception as e:
+        print(f"⚠️ Audio decode failed ({e}). Sending raw audio to STT.")
+        return _finish(audio_bytes, filename, stats, start_time)
+
+    stats["processed"] = True
+    stats["input_audio_ms"] = round(len(samples) * 1000 / TARGET_SAMPLE_RATE)
+    start, end, speech_ms = detect_speech(samples)
+    stats["speech_ms"] = speech_ms
+
+    if end <= start:
+        stats["output_bytes"] = 0
+        stats["output_audio_ms"] = 0
+        return _finish(None, filename, stats, start_time)
+
+    trimmed = samples[start:end]
+    stats["output_audio_ms"] = round(len(trimmed) * 1000 / TARGET_SAMPLE_RATE)
+    try:
+        encoded = encode_opus(trimmed)
+    except Exception as e:
+        print(f"⚠️ Audio encode failed ({e}). Sending raw audio to STT.")
+        encoded = None
+
+    # Safety net: never upload more than the original (e.g. a clip that is almost all speech)
+    if encoded and len(encoded) < len(audio_bytes):
+        stats["output_bytes"] = len(encoded)
+        base = os.path.splitext(filename)[0] or "audio"
+        return _finish(encoded, f"{base}.ogg", stats, start_time)
+    return _finish(audio_bytes, filename, stats, start_time)
+
+
+def _finish(audio_bytes, filename, stats, start_time):
+    stats["preprocess_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+    with _STATS_LOCK:
+        _STATS["clips"] += 1
+        _STATS["input_bytes"] += stats["input_bytes"]
+        _STATS["output_bytes"] += stats["output_bytes"]
+        _STATS["total_preprocess_ms"] += stats["preprocess_ms"]
+        if audio_bytes is None:
+            _STATS["rejected_silent"] += 1
+        elif stats["output_bytes"] == stats["input_bytes"]:
+            _STATS["passthrough"] += 1
+        if stats["processed"]:
+            _STATS["input_audio_ms"] += stats["input_audio_ms"]
+            _STATS["output_audio_ms"] += stats["output_audio_ms"]
+    return audio_bytes, filename, stats
+
+
+def get_preprocess_stats() -> dict:
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    stats["total_preprocess_ms"] = round(stats["total_preprocess_ms"], 1)
+    stats["avg_preprocess_ms"] = round(stats["total_preprocess_ms"] / stats["clips"], 1) if stats["clips"] else 0.0
+    stats["bytes_saved"] = stats["input_bytes"] - stats["output_bytes"]
+    return stats
@@ -0,0 +1,146 @@
+import os
+import threading
+
+# Token-Budget Batch Planner
+# import_from_drive sent a fixed 10 resumes per LLM call and parse_resumes_batch cut every resume
+# at 40,000 chars: ten long CVs could blow the context / output budget, ten short ones wasted calls.
+# Now each extracted text gets a token estimate and resumes are packed (first-fit decreasing) into
+# batches that stay under:
+#   - LLM_BATCH_INPUT_TOKENS   prompt budget (resume texts + instructions)
+#   - LLM_BATCH_OUTPUT_TOKENS  completion budget (~LLM_OUTPUT_TOKENS_PER_RESUME per parsed resume)
+#   - max_items                adaptive: halved after a failed/short batch, -1 when a call is slower
+#                              than LLM_BATCH_TARGET_LATENCY_SECONDS, +1 after fast clean calls
+# A single resume longer than LLM_RESUME_MAX_TOKENS is truncated to that (instead of a char cut).
+# Estimates are chars / LLM_CHARS_PER_TOKEN: no tokenizer dependency, and close enough for packing.
+
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "4"))
+INPUT_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_INPUT_TOKENS", "32000"))
+OUTPUT_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_OUTPUT_TOKENS", "6000"))
+OUTPUT_TOKENS_PER_RESUME = int(os.getenv("LLM_OUTPUT_TOKENS_PER_RESUME", "350"))
+PROMPT_OVERHEAD_TOKENS = 600     # Instructions + JSON format spec + per-resume separators
+PER_RESUME_OVERHEAD_TOKENS = 20  # "--- RESUME #n (Filename: ...) ---"
+MAX_RESUME_TOKENS = min(int(os.getenv("LLM_RESUME_MAX_TOKENS", "10000")),
+                        INPUT_TOKEN_BUDGET - PROMPT_OVERHEAD_TOKENS - PER_RESUME_OVERHEAD_TOKENS)
+MAX_ITEMS_CAP = int(os.getenv("LLM_BATCH_MAX_ITEMS", "20"))
+START_ITEMS = min(int(os.getenv("LLM_BATCH_START_ITEMS", "10")), MAX_ITEMS_CAP)
+TARGET_LATENCY_SECONDS = float(os.getenv("LLM_BATCH_TARGET_LATENCY_SECONDS", "30"))
+UNDERFILLED_RATIO = 0.5          # A tail batch below half of every budget is worth holding back
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text or "") / CHARS_PER_TOKEN) + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int = MAX_RESUME_TOKENS) -> str:
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    return text if len(text) <= max_chars else text[:max_chars]
+
+
+class BatchPlanner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.max_items = START_ITEMS
+        self.error_rate = 0.0  # EWMA of failed calls
+        self.stats = {"calls": 0, "failed_calls": 0, "resumes": 0, "est_input_tokens": 0,
+                      "total_latency_s": 0.0, "truncated_resumes": 0, "held_back": 0,
+                      "shrinks": 0, "grows": 0}
+
+    def item_limit(self) -> int:
+        # Never promise more parsed resumes than the completion budget can hold
+        with self._lock:
+            return max(1, min(self.max_items, OUTPUT_TOKEN_BUDGET // OUTPUT_TOKENS_PER_RESUME))
+
+    def item_tokens(self, text: str) -> int:
+        return min(estimate_tokens(text), MAX_RESUME_TOKENS) + PER_RESUME_OVERHEAD_TOKENS
+
+    def plan(self, items, text_of=lambda item: item) -> list:
+        """
+        Packs items into batches under the input-token and item budgets (first-fit decreasing).
+        Returns a list of batches (lists of items), fullest first, so the last one is the emptiest.
+        """
+        limit = self.item_limit()
+        capacity = INPUT_TOKEN_BUDGET - PROMPT_OVERHEAD_TOKENS
+        sized = sorted(((self.item_tokens(text_of(item)), item) for item in items),
+                       key=lambda pair: pair[0], reverse=True)
+        truncated = sum(1 for item in items if estimate_tokens(text_of(item)) > MAX_RESUME_TOKENS)
+        if truncated:
+            with self._lock:
+                self.stats["truncated_resumes"] += truncated
+
+        bins = []  # [used_tokens, [items]]
+        for tokens, item in sized:
+            for b in bins:
+                if b[0] + tokens <= capacity and len(b[1]) < limit:
+                    b[0] += tokens
+                    b[1].append(item)
+                    break
+            else:
+                bins.append([tokens, [item]])
+        bins.sort(key=lambda b: b[0], reverse=True)
+        return [b[1] for b in bins]
+
+    def batch_tokens(self, batch, text_of=lambda item: item) -> int:
+        return PROMPT_OVERHEAD_TOKENS + sum(self.item_tokens(text_of(item)) for item in batch)
+
+    def is_underfilled(self, batch, text_of=lambda item: item) -> bool:
+        """True if the batch uses under half of BOTH the token budget and the item limit."""
+        return (self.batch_tokens(batch, text_of) < UNDERFILLED_RATIO * INPUT_TOKEN_BUDGET
+                and len(batch) < UNDERFILLED_RATIO * self.item_limit())
+
+    def record(self, n_items: int, est_tokens: int, latency_s: float, ok: bool):
+        """Feeds one LLM call's outcome back into the adaptive item limit."""
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["resumes"] += n_items
+            self.stats["est_input_tokens"] += est_tokens
+            self.stats["total_latency_s"] += latency_s
+            self.error_rate = 0.8 * self.error_rate + 0.2 * (0.0 if ok else 1.0)
+
+            old = self.max_items
+            if not ok:
+                self.stats["failed_calls"] += 1
+                self.max_items = max(1, min(self.max_items, n_items) // 2)
+            elif latency_s > TARGET_LATENCY_SECONDS:
+                self.max_items = max(1, self.max_items - 1)
+            elif latency_s < TARGET_LATENCY_SECONDS / 2 and self.error_rate < 0.1 and n_items >= self.max_items:
+                # Only grow when the limit was actually the constraint
+                self.max_items = min(MAX_ITEMS_CAP, self.max_items + 1)
+
+            if self.max_items < old:
+                self.stats["shrinks"] += 1
+                print(f"📉 LLM batch limit {old} -> {self.max_items} ({'failed call' if not ok else f'{latency_s:.0f}s call'})")
+            elif self.max_items > old:
+                self.stats["grows"] += 1
+
+    def note_held_back(self, n_items: int):
+        with self._lock:
+            self.stats["held_back"] += n_items
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["max_items"] = self.max_items
+            stats["error_rate"] = round(self.error_rate, 3)
+        calls = stats["calls"]
+        stats["input_token_budget"] = INPUT_TOKEN_BUDGET
+        stats["output_token_budget"] = OUTPUT_TOKEN_BUDGET
+        stats["avg_resumes_per_call"] = round(stats["resumes"] / calls, 2) if calls else 0.0
+        stats["avg_est_input_tokens_per_call"] = round(stats["est_input_tokens"] / calls) if calls else 0
+        # Share of the input budget the packed calls actually used
+        stats["packing_efficiency"] = round(stats["est_input_tokens"] / (calls * INPUT_TOKEN_BUDGET), 3) if calls else 0.0
+        stats["avg_latency_s"] = round(stats["total_latency_s"] / calls, 2) if calls else 0.0
+        stats["total_latency_s"] = round(stats["total_latency_s"], 1)
+        return stats
+
+
+_planner = None
+_planner_lock = threading.Lock()
+
+def get_batch_planner() -> BatchPlanner:
+    """Process-wide, so what one import learns about latency/errors carries over to the next."""
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                _planner = BatchPlanner()
+    return _planner
@@ -1,14 +1,14 @@
 from datetime import datetime, timedelta
 import pytz
 import os
-from googleapiclient.discovery import build
 from services.google_auth import get_google_creds
+from services.google_clients import get_pooled_service
 
 def get_calendar_service():
     creds = get_google_creds()
     if not creds:
         return None
-    return build('calendar', 'v3', credentials=creds)
+    return get_pooled_service('calendar', 'v3', creds)
 
 def find_available_slot(duration_minutes=45):
     """
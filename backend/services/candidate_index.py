@@ -0,0 +1,101 @@
+import time
+import threading
+from typing import Optional
+from services.sheets import register_write_listener, split_range
+from services.sheet_replica import read_sheet_replica
+
+# In-memory lookup index for the voice interview
+# Every spoken answer used to download 'Analysis - {job}'!A:K AND HRQuestions!A:E and scan them.
+# Here each tab is loaded once into dicts:
+#   (job, email) -> candidate name        (from 'Analysis - {job}', Name=A, Email=J)
+#   (job, name)  -> questions string      (from HRQuestions, Name=B, Job=C, Questions=E)
+# and kept current from our own appends via the sheets write listener.
+
+# A miss on a snapshot older than this triggers ONE reload (rows added by hand in the sheet)
+MISS_RELOAD_AFTER_SECONDS = 60
+
+_EMAIL_INDEX = {}      # (job, email) -> name
+_QUESTIONS_INDEX = {}  # (job, name) -> questions
+_LOADED_AT = {}        # "Analysis - {job}" / "HRQuestions" -> load timestamp
+_LOCK = threading.RLock()
+
+
+def _norm(value) -> str:
+    return str(value).lower().strip()
+
+
+def _add_analysis_row(job: str, row):
+    # First occurrence wins (same as the old top-to-bottom scan)
+    if len(row) > 9 and row[9]:
+        _EMAIL_INDEX.setdefault((_norm(job), _norm(row[9])), str(row[0]).strip())
+
+
+def _add_questions_row(row):
+    if len(row) > 4:
+        _QUESTIONS_INDEX.setdefault((_norm(row[2]), _norm(row[1])), row[4])
+
+
+def _load_analysis(job: str):
+    sheet_name = f"Analysis - {job}"
+    rows = read_sheet_replica(f"{sheet_name}!A:K")
+    with _LOCK:
+        for key in [k for k in _EMAIL_INDEX if k[0] == _norm(job)]:
+            del _EMAIL_INDEX[key]
+        for row in rows[1:]:
+            _add_analysis_row(job, row)
+        _LOADED_AT[sheet_name] = time.time()
+
+
+def _load_questions():
+    rows = read_sheet_replica("HRQuestions!A:E")
+    with _LOCK:
+        _QUESTIONS_INDEX.clear()
+        for row in rows[1:]:
+            _add_questions_row(row)
+        _LOADED_AT["HRQuestions"] = time.time()
+
+
+def _lookup(index: dict, key, sheet_name: str, loader) -> Optional[str]:
+    with _LOCK:
+        loaded_at = _LOADED_AT.get(sheet_name)
+        if loaded_at is not None:
+            if key in index or time.time() - loaded_at < MISS_RELOAD_AFTER_SECONDS:
+                return index.get(key)
+    loader()
+    with _LOCK:
+        return index.get(key)
+
+
+def find_candidate_name(job_title: str, email: str) -> Optional[str]:
+    key = (_norm(job_title), _norm(email))
+    return _lookup(_EMAIL_INDEX, key, f"Analysis - {job_title}", lambda: _load_analysis(job_title))
+
+
+def find_questions(job_title: str, candidate_name: str) -> Optional[str]:
+    key = (_norm(job_title), _norm(candidate_name))
+    return _lookup(_QUESTIONS_INDEX, key, "HRQuestions", _load_questions)
+
+
+def _on_sheet_write(updated_range: str, values):
+    sheet_name, cell_range = split_range(updated_range)
+    if cell_range.upper().split(":")[0] == "A1":
+        return  # Header row write
+    with _LOCK:
+        # Only maintain tabs we've already loaded; others load on first lookup
+        if sheet_name not in _LOADED_AT:
+            return
+        if sheet_name == "HRQuestions":
+            for row in values:
+                _add_questions_row(row)
+        elif sheet_name.startswith("Analysis - "):
+            job = sheet_name[len("Analysis - "):]
+            for row in values:
+                _add_analysis_row(job, row)
+
+
+register_write_listener(_on_sheet_write)
+
+
+def get_index_stats() -> dict:
+    with _LOCK:
+        return {"emails": len(_EMAIL_INDEX), "questions": len(_QUESTIONS_INDEX), "tabs_loaded": len(_LOADED_AT)}
@@ -1,20 +1,111 @@
-from docx import Document
 import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Streaming DOCX Extraction
+# python-docx builds the whole Document object model, and resume templates with merged table
+# cells make it yield the SAME cell once per grid column it spans (duplicated text, slow).
+# Instead we read the WordprocessingML parts straight from the zip with iterparse:
+#   - headers (name/contact block in many templates), body, footers
+#   - paragraphs and table cells exactly once, in document order (merged cells are one <w:tc>)
+#   - text boxes (<w:txbxContent>) as their own paragraphs; the VML copy inside
+#     <mc:Fallback> is skipped so shapes aren't read twice
+# The old python-docx implementation is kept as a fallback for files the fast path can't read.
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+HEADER_RE = re.compile(r'word/header\d*\.xml$')
+FOOTER_RE = re.compile(r'word/footer\d*\.xml$')
+
+
+def _iter_part_paragraphs(xml_file):
+    """Yields paragraph strings from one WordprocessingML part, in document order."""
+    stack = []          # One text buffer per open <w:p> (text box paragraphs nest inside a run)
+    fallback_depth = 0  # > 0 while inside <mc:Fallback> (duplicate VML rendering)
+    ppr_depth = 0       # > 0 while inside <w:pPr> (its <w:tabs><w:tab/> are tab-stop definitions, not text)
+
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif tag == W + 'pPr':
+                ppr_depth += 1
+            elif tag == W + 'p' and not fallback_depth:
+                stack.append([])
+            continue
+
+        # event == "end"
+        if tag == MC_FALLBACK:
+            fallback_depth -= 1
+        elif tag == W + 'pPr':
+            ppr_depth -= 1
+        elif fallback_depth or ppr_depth or not stack:
+            pass
+        elif tag == W + 't':
+            if elem.text:
+                stack[-1].append(elem.text)
+        elif tag == W + 'tab':
+            stack[-1].append('\t')
+        elif tag in (W + 'br', W + 'cr'):
+            stack[-1].append('\n')
+        elif tag == W + 'p':
+            text = ''.join(stack.pop())
+            if text.strip():
+                yield text
+            elem.clear()  # Done with this paragraph's subtree
+
 
 def extract_text_from_docx(file_content: bytes) -> str:
+    """
+    Extracts text from a DOCX file (headers, body incl. tables and text boxes, footers).
+    Streams word/*.xml with iterparse instead of building the python-docx object model.
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_content)) as zf:
+            names = zf.namelist()
+            parts = sorted(n for n in names if HEADER_RE.match(n))
+            parts.append('word/document.xml')
+            parts += sorted(n for n in names if FOOTER_RE.match(n))
+
+            full_text = []
+            seen_edge_text = set()  # first/even/default headers usually repeat the same lines
+            for part in parts:
+                if part not in names:
+                    continue
+                is_body = part == 'word/document.xml'
+                with zf.open(part) as xml_file:
+                    for para in _iter_part_paragraphs(xml_file):
+                        if not is_body:
+                            if para in seen_edge_text:
+                                continue
+                            seen_edge_text.add(para)
+                        full_text.append(para)
+
+        return '\n'.join(full_text).strip()
+
+    except Exception as e:
+        print(f"Streaming DOCX extraction failed ({e}). Trying python-docx...")
+        return extract_text_from_docx_python_docx(file_content)
+
+
+def extract_text_from_docx_python_docx(file_content: bytes) -> str:
     """
     Extracts text from a DOCX file using python-docx.
     Handles both standard paragraphs and tables (common in resumes).
     """
     try:
+        from docx import Document
         doc = Document(io.BytesIO(file_content))
         full_text = []
-        
+
         # 1. Extract text from paragraphs
         for para in doc.paragraphs:
             if para.text.strip():
                 full_text.append(para.text)
-                
+
         # 2. Extract text from tables (common in resumes)
         for table in doc.tables:
             for row in table.rows:
@@ -22,9 +113,9 @@ def extract_text_from_docx(file_content: bytes) -> str:
                     for para in cell.paragraphs:
                         if para.text.strip():
                             full_text.append(para.text)
-                            
+
         return '\n'.join(full_text).strip()
-        
+
     except Exception as e:
         print(f"Error extracting DOCX text with python-docx: {e}")
         return ""
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+from googleapiclient.errors import HttpError
+from services.drive_service import get_drive_service, FOLDER_MIME
+
+# Incremental Drive Import (Changes API)
+# A full import walks the whole folder tree and relies on the sheet source-key check to skip
+# files it has already seen. In incremental mode we instead ask Drive what changed since the
+# last run (changes.list from a saved page token) and only look at those files:
+#   - the start page token is persisted per root folder in DRIVE_SYNC_STATE_PATH
+#   - each changed file is mapped to its job folder (direct child of the root) by walking up
+#     its parents (memoized, so a batch of changes in the same folder costs one lookup)
+#   - if there is no token yet or Drive rejects it (expired), the caller does a full rescan and
+#     saves a token taken BEFORE that scan, so nothing changed during the scan is missed
+#   - files that failed in a run (download / extraction / LLM / sheet write errors) are saved
+#     with the token and merged into the next incremental run, since changes.list won't report
+#     them again; each gets up to DRIVE_RETRY_MAX_ATTEMPTS runs before it's dropped
+
+DRIVE_SYNC_STATE_PATH = os.getenv("DRIVE_SYNC_STATE_PATH", "drive_sync_state.json")
+DRIVE_RETRY_MAX_ATTEMPTS = int(os.getenv("DRIVE_RETRY_MAX_ATTEMPTS", "5"))
+FILE_FIELDS = "id, name, mimeType, size, md5Checksum, createdTime, modifiedTime, webViewLink, parents, trashed"
+CHANGE_FIELDS = f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))"
+
+
+class PageTokenExpired(Exception):
+    """Drive no longer accepts the saved page token -> full rescan needed."""
+
+
+def _load_state() -> dict:
+    try:
+        with open(DRIVE_SYNC_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ Could not read {DRIVE_SYNC_STATE_PATH}: {e}. Starting fresh.")
+        return {}
+
+
+def get_saved_page_token(root_folder_id: str):
+    return _load_state().get(root_folder_id, {}).get("page_token")
+
+
+def get_retry_file_ids(root_folder_id: str) -> list:
+    """Files that failed in earlier runs and must be retried on top of the next changes.list."""
+    return list(_load_state().get(root_folder_id, {}).get("retry_files", {}))
+
+
+def save_page_token(root_folder_id: str, page_token: str, failed_file_ids=()):
+    """Saves the token plus the files this run failed on (replacing the previous retry list)."""
+    state = _load_state()
+    previous = state.get(root_folder_id, {}).get("retry_files", {})
+    retry_files = {}
+    for file_id in failed_file_ids:
+        attempts = previous.get(file_id, 0) + 1
+        if attempts > DRIVE_RETRY_MAX_ATTEMPTS:
+            print(f"⚠️ Giving up on Drive file {file_id} after {DRIVE_RETRY_MAX_ATTEMPTS} failed runs")
+            continue
+        retry_files[file_id] = attempts
+    state[root_folder_id] = {"page_token": page_token, "saved_at": time.time(), "retry_files": retry_files}
+    tmp_path = DRIVE_SYNC_STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, DRIVE_SYNC_STATE_PATH)  # Atomic: a crash never leaves a half-written token
+    print(f"💾 Saved Drive page token for {root_folder_id} ({len(retry_files)} file(s) to retry next run)")
+
+
+def get_start_page_token() -> str:
+    """Token for 'now'. Take it BEFORE a full scan so changes made during the scan are picked up next time."""
+    return get_drive_service().changes().getStartPageToken().execute()["startPageToken"]
+
+
+def list_changed_files(page_token: str):
+    """
+    All files added/modified since page_token. Returns (files, new_page_token).
+    Folders, trashed and removed entries are dropped (deletions never un-import a candidate).
+    """
+    service = get_drive_service()
+    files = {}
+    changes_seen = 0
+    while True:
+        try:
+            results = service.changes().list(
+                pageToken=page_token,
+                fields=CHANGE_FIELDS,
+                pageSize=1000,
+                includeRemoved=False,
+                restrictToMyDrive=False
+            ).execute()
+        except HttpError as e:
+            if e.resp.status in (400, 404, 410):
+                raise PageTokenExpired(str(e))
+            raise
+
+        for change in results.get("changes", []):
+            changes_seen += 1
+            f = change.get("file")
+            if change.get("removed") or not f or f.get("trashed") or f.get("mimeType") == FOLDER_MIME:
+                continue
+            files[f["id"]] = f  # Latest change per file wins
+
+        if "newStartPageToken" in results:
+            print(f"🔁 Drive changes: {changes_seen} changes -> {len(files)} changed files")
+            return list(files.values()), results["newStartPageToken"]
+        page_token = results["nextPageToken"]
+
+
+def get_files(file_ids: list) -> list:
+    """Current metadata for specific files (retries). Deleted / trashed / inaccessible ones are dropped."""
+    service = get_drive_service()
+    files = []
+    for file_id in file_ids:
+        try:
+            f = service.files().get(fileId=file_id, fields=FILE_FIELDS).execute()
+        except HttpError as e:
+            print(f"⚠️ Retry file {file_id} is no longer accessible ({e.resp.status}). Dropping it.")
+            continue
+        if not f.get("trashed"):
+            files.append(f)
+    return files
+
+
+def group_by_job_folder(files: list, root_folder_id: str, job_folders: list) -> dict:
+    """
+    Maps each changed file to the job folder it lives under. Returns {job_folder_id: [files]}.
+    Files outside the root folder's tree are skipped.
+    job_folders: the root's direct subfolders (or [root] when it has none).
+    """
+    service = get_drive_service()
+    job_folder_ids = {f["id"] for f in job_folders}
+    parents_memo = {}  # folder_id -> its parents (one files.get per folder, ever)
+    resolved = {}      # folder_id -> job folder id | None
+
+    def resolve(folder_id, depth=0):
+        if folder_id in resolved:
+            return resolved[folder_id]
+        if folder_id in job_folder_ids:
+            return folder_id
+        if folder_id == root_folder_id or depth > 50:
+            return None  # Directly in root (not in a job folder) / runaway chain
+        if folder_id not in parents_memo:
+            try:
+                meta = service.files().get(fileId=folder_id, fields="id, parents").execute()
+                parents_memo[folder_id] = meta.get("parents", [])
+            except HttpError:
+                parents_memo[folder_id] = []  # Not visible to us -> outside the tree
+        job_id = None
+        for parent in parents_memo[folder_id]:
+            job_id = resolve(parent, depth + 1)
+            if job_id:
+                break
+        resolved[folder_id] = job_id
+        return job_id
+
+    grouped = {}
+    for f in files:
+        for parent in f.get("parents", []):
+            job_id = resolve(parent)
+            if job_id:
+                grouped.setdefault(job_id, []).append(f)
+                break
+    print(f"🔁 Drive changes: {sum(len(v) for v in grouped.values())}/{len(files)} changed files are in "
+          f"{len(grouped)} job folder(s) ({len(parents_memo)} parent lookups)")
+    return grouped
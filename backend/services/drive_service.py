@@ -1,48 +1,45 @@
-import os
 import io
-from googleapiclient.discovery import build
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from googleapiclient.http import MediaIoBaseDownload
-from services.sheets import get_credentials
+from services.google_clients import get_service_account_credentials, get_pooled_service
 
-# Add Drive scope to the existing scopes logic in your head, 
-# but since get_credentials in sheets.py is hardcoded with SCOPES, 
-# we might need to update sheets.py or handle it here.
-# ideally we refactor sheets.py to allow passing scopes, but for now 
-# let's just create a local helper or modify sheets.py.
-# Actually, I'll assume I can modify sheets.py to export SCOPES or allow overriding.
-# For now, I'll copy the credential loading logic but with Drive scope.
+SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
-from google.oauth2.service_account import Credentials
-import json
+# Resume Prefilter
+# Resume folders also hold images, zips, spreadsheets and videos. Only these MIME types are listed
+# (filtered in the Drive q= query itself, so the rest is never returned, let alone downloaded).
+# Override with DRIVE_RESUME_MIME_TYPES (comma separated).
+DEFAULT_RESUME_MIME_TYPES = [
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',  # .docx
+    'application/vnd.google-apps.document',                                    # Google Docs (exported as DOCX)
+    'text/plain',
+]
+RESUME_MIME_TYPES = [m.strip() for m in os.getenv("DRIVE_RESUME_MIME_TYPES", ",".join(DEFAULT_RESUME_MIME_TYPES)).split(",") if m.strip()]
 
-SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+def _mime_filter(mime_types: list = None) -> str:
+    """q= clause matching any allowed MIME type ('' = no restriction)."""
+    if not mime_types:
+        return ""
+    return "(" + " or ".join(f"mimeType = '{m}'" for m in mime_types) + ")"
 
 def get_drive_service():
-    creds_path = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
-    if not creds_path:
-        # Fallback to API Key if Service Account not set (though highly recommended)
-        # But for accessing private folders, Service Account is needed.
-        # If the user specifically wants to use API Key, we'd build with developerKey.
-        # build('drive', 'v3', developerKey=api_key)
-        # However, listing folder usually requires OAuth for non-public.
-        pass
-
-    creds = None
-    if os.path.exists(creds_path):
-        creds = Credentials.from_service_account_file(creds_path, scopes=SCOPES)
-    else:
-        info = json.loads(creds_path)
-        creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-    
-    return build('drive', 'v3', credentials=creds)
+    # Credentials and service object are cached (per thread) by the shared client layer
+    creds = get_service_account_credentials(SCOPES)
+    return get_pooled_service('drive', 'v3', creds)
 
-def list_files_in_folder(folder_id: str, min_date: str = None, max_date: str = None):
+def list_files_in_folder(folder_id: str, min_date: str = None, max_date: str = None, mime_types: list = None):
     """
     Lists files in the specified drive folder (all pages).
     Args:
         folder_id: ID of the folder to list.
         min_date: Optional ISO date string (YYYY-MM-DD) to filter files created on or after this date.
         max_date: Optional ISO date string (YYYY-MM-DD) to filter files created on or before this date.
+        mime_types: Optional MIME allowlist (e.g. RESUME_MIME_TYPES), applied server-side.
     """
     service = get_drive_service()
     all_files = []
@@ -58,6 +55,9 @@ def list_files_in_folder(folder_id: str, min_date: str = None, max_date: str = N
     if max_date:
         # Filter files created on or before max_date (end of day)
         query += f" and modifiedTime <= '{max_date}T23:59:59'"
+
+    if mime_types:
+        query += f" and {_mime_filter(mime_types)}"
         
     print(f"DEBUG: Drive Query -> {query}")
 
@@ -97,42 +97,153 @@ def list_folders(parent_id: str):
             
     return all_folders
 
+# Concurrent Breadth-First Traversal
+# The old recursive walk made 2 paginated files.list calls PER folder (files, then subfolders), one
+# folder at a time. Now each level of the tree is listed in groups of folders:
+#   - one query covers many folders: ('a' in parents or 'b' in parents or ...)
+#   - files AND subfolders come back from that same query (folders are never date filtered)
+#   - up to DRIVE_LIST_CONCURRENCY group queries run at once, on a process-wide pool whose threads
+#     live across scans (so each keeps its thread-local client and open connections, see google_clients)
+#   - files are yielded as soon as their page arrives, so downloads can start before the scan ends
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+LIST_CONCURRENCY = int(os.getenv("DRIVE_LIST_CONCURRENCY", "4"))
+PARENTS_PER_QUERY = int(os.getenv("DRIVE_PARENTS_PER_QUERY", "20"))  # Keeps the q= string well under Drive's limit
+
+_EXECUTORS = {}  # name -> ThreadPoolExecutor, created on first use and never shut down
+_EXECUTORS_LOCK = threading.Lock()
+
+def _get_executor(name: str, workers: int) -> ThreadPoolExecutor:
+    """
+    Long-lived pool per stage. A pool per call would start fresh threads every scan/import,
+    and every fresh thread has to build its Drive client and open its connections again.
+    """
+    executor = _EXECUTORS.get(name)
+    if executor is None:
+        with _EXECUTORS_LOCK:
+            executor = _EXECUTORS.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"drive-{name}")
+                _EXECUTORS[name] = executor
+    return executor
+
+def _file_filter(min_date: str = None, max_date: str = None, mime_types: list = None) -> str:
+    """q= conditions for non-folder entries (date window + MIME allowlist)."""
+    clauses = []
+    if mime_types:
+        clauses.append(_mime_filter(mime_types))
+    if min_date:
+        clauses.append(f"modifiedTime >= '{min_date}T00:00:00'")
+    if max_date:
+        clauses.append(f"modifiedTime <= '{max_date}T23:59:59'")
+    return " and ".join(clauses)
+
+def _list_children(parent_ids: list, file_filter: str = ""):
+    """One paginated listing of everything directly inside ANY of parent_ids. Returns (files, folders)."""
+    service = get_drive_service()
+    parents_clause = " or ".join(f"'{pid}' in parents" for pid in parent_ids)
+    query = f"({parents_clause}) and trashed=false"
+    if file_filter:
+        query += f" and (mimeType = '{FOLDER_MIME}' or ({file_filter}))"
+
+    files, folders = [], []
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=query,
+            fields="nextPageToken, files(id, name, mimeType, size, md5Checksum, createdTime, modifiedTime, webViewLink)",
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        for item in results.get('files', []):
+            (folders if item.get('mimeType') == FOLDER_MIME else files).append(item)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return files, folders
+
+def iter_files_recursive(folder_id: str, min_date: str = None, max_date: str = None, mime_types: list = None,
+                         max_workers: int = LIST_CONCURRENCY, parents_per_query: int = PARENTS_PER_QUERY):
+    """
+    Yields every file under folder_id (any depth), as it is found.
+    Breadth-first, with bounded concurrency and multi-parent queries (see above).
+    max_workers caps this scan's in-flight queries (the shared pool has LIST_CONCURRENCY threads).
+    mime_types: optional allowlist pushed into the query (folders are always traversed).
+    """
+    file_filter = _file_filter(min_date, max_date, mime_types)
+    seen_folders = {folder_id}
+    seen_files = set()  # A file with 2 parents inside the tree would otherwise come back twice
+    pending_folders = deque([folder_id])
+    stats = {"queries": 0, "folders": 1, "files": 0}
+    start = time.perf_counter()
+
+    executor = _get_executor("list", LIST_CONCURRENCY)
+    in_flight = set()
+    try:
+        while pending_folders or in_flight:
+            # Keep the pool busy: one group of folders per free worker
+            while pending_folders and len(in_flight) < max_workers:
+                group = [pending_folders.popleft() for _ in range(min(parents_per_query, len(pending_folders)))]
+                in_flight.add(executor.submit(_list_children, group, file_filter))
+                stats["queries"] += 1
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, folders = future.result()
+                for folder in folders:
+                    if folder['id'] not in seen_folders:
+                        seen_folders.add(folder['id'])
+                        pending_folders.append(folder['id'])
+                        stats["folders"] += 1
+                for f in files:
+                    if f['id'] not in seen_files:
+                        seen_files.add(f['id'])
+                        stats["files"] += 1
+                        yield f
+    finally:
+        # Caller stopped early (or a listing failed): drop this scan's queued queries
+        for future in in_flight:
+            future.cancel()
+        print(f"📂 Drive scan: {stats['files']} files in {stats['folders']} folders with "
+              f"{stats['queries']} queries in {time.perf_counter() - start:.1f}s")
+
 def list_files_recursive(folder_id: str, min_date: str = None, max_date: str = None):
     """
     Recursively lists ALL files in a folder and its subfolders.
     Returns a flat list of file objects.
     """
-    all_files = []
-    
-    # 1. Get files in current folder
-    current_files = list_files_in_folder(folder_id, min_date, max_date)
-    all_files.extend(current_files)
-    
-    # 2. Get subfolders (folders are NOT date filtered, we always traverse them to find files)
-    subfolders = list_folders(folder_id)
-    
-    # 3. Recurse
-    for folder in subfolders:
-        # print(f"  ↪️ Entering subfolder: {folder['name']}")
-        sub_files = list_files_recursive(folder['id'], min_date, max_date)
-        all_files.extend(sub_files)
-        
-    return all_files
+    return list(iter_files_recursive(folder_id, min_date, max_date))
+
+# Download Pool
+# The import used to download one file at a time (plus a files.get per file just to learn the
+# mimeType) and stop downloading while a batch was being parsed by the LLM. Now:
+#   - mimeType/size come from the listing (no metadata round-trip)
+#   - DRIVE_DOWNLOAD_WORKERS downloads run in parallel on a process-wide pool (threads, and so their
+#     pooled clients and connections, are reused from one import to the next)
+#   - at most DRIVE_DOWNLOAD_MAX_IN_FLIGHT files are downloading/downloaded-but-unconsumed, so a
+#     slow parsing stage holds the pool back instead of piling resumes up in memory (backpressure)
+#   - files over DRIVE_MAX_DOWNLOAD_BYTES are refused (from the listing size, or mid-download for exports)
+DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "10"))
+DOWNLOAD_MAX_IN_FLIGHT = int(os.getenv("DRIVE_DOWNLOAD_MAX_IN_FLIGHT", str(DOWNLOAD_WORKERS * 2)))
+MAX_DOWNLOAD_BYTES = int(os.getenv("DRIVE_MAX_DOWNLOAD_BYTES", str(20 * 1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
 
-def download_file(file_id: str):
+def download_file(file_id: str, mime_type: str = None, name: str = None, max_bytes: int = None):
     """
     Downloads a file's content.
-    Automatically handles Google Docs by exporting them as PDF.
+    Automatically handles Google Docs by exporting them as DOCX.
+    Pass mime_type (from the listing) to skip the metadata request.
     """
     service = get_drive_service()
     
-    # Check mimeType first
-    file_meta = service.files().get(fileId=file_id, fields="mimeType, name").execute()
-    mime_type = file_meta.get('mimeType', '')
+    if mime_type is None:
+        # Check mimeType first
+        file_meta = service.files().get(fileId=file_id, fields="mimeType, name").execute()
+        mime_type = file_meta.get('mimeType', '')
+        name = name or file_meta.get('name')
     
     if mime_type.startswith('application/vnd.google-apps.'):
         # It's a Google Doc/Sheet/Slide -> Export as DOCX (MS Word)
-        print(f"  📄 Converting Google Doc '{file_meta.get('name')}' to DOCX...")
+        print(f"  📄 Converting Google Doc '{name}' to DOCX...")
         request = service.files().export_media(
             fileId=file_id,
             mimeType='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
@@ -142,8 +253,78 @@ def download_file(file_id: str):
         request = service.files().get_media(fileId=file_id)
         
     fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
+    downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_BYTES)
     done = False
     while done is False:
         status, done = downloader.next_chunk()
+        if max_bytes and fh.tell() > max_bytes:
+            raise ValueError(f"File too large (over {max_bytes} bytes)")
     return fh.getvalue()
+
+def prefilter_resume_files(files, stats: dict, mime_types: list = None, max_bytes: int = MAX_DOWNLOAD_BYTES):
+    """
+    Client-side half of the resume prefilter: drops files whose listed size is over max_bytes
+    (Drive's q= can't filter on size) and, for sources that can't be filtered server-side
+    (changes.list has no q=), files outside the MIME allowlist.
+    Counts go into stats['filtered_mime'] / stats['filtered_size'].
+    """
+    stats.setdefault("filtered_mime", 0)
+    stats.setdefault("filtered_size", 0)
+    for f in files:
+        if mime_types and f.get('mimeType') not in mime_types:
+            stats["filtered_mime"] += 1
+            continue
+        size = f.get('size')
+        if max_bytes and size and int(size) > max_bytes:
+            print(f"DEBUG: Skipping {f.get('name')} ({int(size)} bytes > {max_bytes} byte cap)")
+            stats["filtered_size"] += 1
+            continue
+        yield f
+
+def _download_listed_file(f: dict, max_bytes: int):
+    size = f.get('size')
+    if max_bytes and size and int(size) > max_bytes:
+        raise ValueError(f"File too large ({int(size)} bytes > {max_bytes})")
+    return download_file(f['id'], mime_type=f.get('mimeType', ''), name=f.get('name'), max_bytes=max_bytes)
+
+def download_files(files, max_in_flight: int = DOWNLOAD_MAX_IN_FLIGHT, max_bytes: int = MAX_DOWNLOAD_BYTES):
+    """
+    Downloads listed files (any iterable, e.g. iter_files_recursive) in parallel.
+    Yields (file, content, error) in completion order; exactly one of content/error is set.
+    New downloads only start while fewer than max_in_flight results are waiting to be consumed.
+    """
+    files = iter(files)
+    executor = _get_executor("download", DOWNLOAD_WORKERS)
+    in_flight = {}
+    exhausted = False
+    stats = {"files": 0, "bytes": 0, "errors": 0}
+    start = time.perf_counter()
+    try:
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                f = next(files, None)
+                if f is None:
+                    exhausted = True
+                    break
+                in_flight[executor.submit(_download_listed_file, f, max_bytes)] = f
+
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                f = in_flight.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    stats["errors"] += 1
+                    yield f, None, e
+                    continue
+                stats["files"] += 1
+                stats["bytes"] += len(content)
+                yield f, content, None
+    finally:
+        # Consumer stopped early: drop this call's downloads that haven't started
+        for future in in_flight:
+            future.cancel()
+        print(f"📥 Drive downloads: {stats['files']} files ({stats['bytes'] / 1048576:.1f} MB), "
+              f"{stats['errors']} errors in {time.perf_counter() - start:.1f}s")
@@ -1,8 +1,8 @@
 import os
 import base64
 from email.mime.text import MIMEText
-from googleapiclient.discovery import build
 from services.google_auth import get_google_creds
+from services.google_clients import get_pooled_service
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,7 +12,7 @@ def get_gmail_service():
     creds = get_google_creds()
     if not creds:
         return None
-    return build('gmail', 'v1', credentials=creds)
+    return get_pooled_service('gmail', 'v1', creds)
 
 def send_email(to: str, subject: str, message_text: str):
     try:
@@ -1,4 +1,5 @@
 import os
+import threading
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -12,7 +13,34 @@ SCOPES = [
     'https://www.googleapis.com/auth/calendar'
 ]
 
+# Process-wide cache so Gmail/Calendar don't re-read token.json on every call
+_CACHED_CREDS = None
+_CREDS_LOCK = threading.Lock()
+
 def get_google_creds():
+    """
+    Returns cached OAuth2 credentials, refreshing them in place when expired.
+    Falls back to the token.json / browser login flow when nothing usable is cached.
+    """
+    global _CACHED_CREDS
+    with _CREDS_LOCK:
+        creds = _CACHED_CREDS
+        if creds and creds.valid:
+            return creds
+
+        if creds and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                with open('token.json', 'w') as token:
+                    token.write(creds.to_json())
+                return creds
+            except Exception as e:
+                print(f"⚠️ Cached token refresh failed: {e}. Reloading...")
+
+        _CACHED_CREDS = _load_google_creds()
+        return _CACHED_CREDS
+
+def _load_google_creds():
     """
     Handles OAuth2 authentication and returns credentials.
     manages token.json for persistence.
@@ -30,7 +58,7 @@ def get_google_creds():
             except Exception as e:
                 print(f"⚠️ Token refresh failed: {e}. Re-authenticating...")
                 os.remove('token.json')
-                return get_google_creds() # Recursive call to trigger new login
+                return _load_google_creds() # Recursive call to trigger new login
         else:
             if not os.path.exists('credentials.json'):
                 print("❌ ERROR: credentials.json not found in backend folder.")
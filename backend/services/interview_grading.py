@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import datetime
+import threading
+from contextlib import nullcontext
+from typing import Optional
+from services.llm import get_llm
+from services.llm_cache import bypass_llm_cache
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+# Background Interview Grading
+# Grading used to run inline on the candidate's LAST turn (second LLM call + Sheets write),
+# doubling that turn's latency. Now the endpoint just enqueues a job here and returns.
+# Jobs live in SQLite so they survive restarts; a worker thread grades them with retries
+# and writes the result to VoiceInterviews.
+# Several processes (Passenger workers) may share grading_jobs.db:
+#   - a claim only succeeds if the row is still in the state we read (guarded UPDATE + rowcount)
+#   - 'running' is a lease: a job whose worker died is re-queued once it hasn't been touched
+#     for GRADING_LEASE_SECONDS (not blindly on every startup, which stole live jobs)
+#   - the grade is stored on the job before the Sheets write, and the job is only 'done' after
+#     the row is actually in the sheet (synchronous append, we're off the request path anyway)
+
+GRADING_DB_PATH = os.getenv("GRADING_DB_PATH", "grading_jobs.db")
+GRADING_MAX_ATTEMPTS = int(os.getenv("GRADING_MAX_ATTEMPTS", "4"))
+GRADING_POLL_SECONDS = 5
+GRADING_LEASE_SECONDS = float(os.getenv("GRADING_LEASE_SECONDS", "600"))  # > LLM timeout + Sheets write
+
+GRADING_PROMPT = """You are a Senior Hiring Manager. Grade this interview transcript for a {job_title} role.
+
+                Transcript:
+                {history}
+                Candidate: {user_input}
+
+                Return JSON ONLY:
+                {{
+                    "score": "0-10",
+                    "verdict": "PASS or FAIL",
+                    "feedback": "1 short sentence summary"
+                }}
+                """
+
+VOICE_INTERVIEW_HEADERS = ["Date", "Candidate Email", "Job Title", "Score", "Verdict", "Feedback", "Transcript Link"]
+
+_conn = None
+_db_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(GRADING_DB_PATH, check_same_thread=False, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS grading_jobs (
+                id TEXT PRIMARY KEY,
+                candidate_email TEXT NOT NULL,
+                job_title TEXT NOT NULL,
+                history TEXT NOT NULL,
+                user_input TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_grading_status ON grading_jobs (status, next_attempt_at)")
+        _conn.commit()
+        # Jobs left 'running' by a dead process are picked up again by _claim_next_job once their lease expires
+    return _conn
+
+
+def enqueue_grading(candidate_email: str, job_title: str, history: str, user_input: str) -> str:
+    """Persists a grading job (full transcript) and wakes the worker. Returns the job id."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _db_lock:
+        conn = _db()
+        conn.execute(
+            "INSERT INTO grading_jobs (id, candidate_email, job_title, history, user_input, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, candidate_email, job_title, history, user_input, now, now)
+        )
+        conn.commit()
+    start_grading_worker()
+    _wake.set()
+    print(f"🗂️ Queued interview grading job {job_id} for {candidate_email}")
+    return job_id
+
+
+def get_grading_status(job_id: str) -> Optional[dict]:
+    with _db_lock:
+        row = _db().execute(
+            "SELECT id, candidate_email, job_title, status, attempts, result, error, created_at, updated_at "
+            "FROM grading_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    if not row:
+        return None
+    return {
+        "job_id": row[0],
+        "candidate_email": row[1],
+        "job_title": row[2],
+        "status": row[3],
+        "attempts": row[4],
+        "result": json.loads(row[5]) if row[5] else None,
+        "error": row[6],
+        "created_at": row[7],
+        "updated_at": row[8]
+    }
+
+
+def _claim_next_job():
+    """Next due job (or one whose 'running' lease expired), claimed atomically across processes."""
+    with _db_lock:
+        conn = _db()
+        now = time.time()
+        candidates = conn.execute(
+            "SELECT id, candidate_email, job_title, history, user_input, attempts, result, status, updated_at "
+            "FROM grading_jobs "
+            "WHERE (status = 'queued' AND next_attempt_at <= ?) OR (status = 'running' AND updated_at < ?) "
+            "ORDER BY created_at LIMIT 5",
+            (now, now - GRADING_LEASE_SECONDS)
+        ).fetchall()
+        for row in candidates:
+            # Only wins if nobody claimed / touched it since we read it
+            cur = conn.execute(
+                "UPDATE grading_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = ? AND updated_at = ?",
+                (now, row[0], row[7], row[8])
+            )
+            conn.commit()
+            if cur.rowcount == 1:
+                if row[7] == 'running':
+                    print(f"♻️ Grading job {row[0]} lease expired (worker died?). Taking it over.")
+                return row[:7]
+    return None
+
+
+def _update_job(job_id: str, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    with _db_lock:
+        conn = _db()
+        conn.execute(f"UPDATE grading_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+
+
+def grade_transcript(job_title: str, history: str, user_input: str, fresh: bool = False) -> dict:
+    """fresh=True skips the LLM cache (a retry must not get the same unparseable completion back)."""
+    llm = get_llm()
+    chain = PromptTemplate(template=GRADING_PROMPT, input_variables=["job_title", "history", "user_input"]) | llm | StrOutputParser()
+    with bypass_llm_cache() if fresh else nullcontext():
+        grade_json = chain.invoke({"job_title": job_title, "history": history, "user_input": user_input})
+
+    # Clean potential markdown code blocks
+    grade_str = grade_json.replace("```json", "").replace("```", "").strip()
+    return json.loads(grade_str)  # Parse errors are retried like API errors
+
+
+def _save_grades(job_id: str, candidate_email: str, job_title: str, grades: dict):
+    """Synchronous append: raises if the row didn't make it, so the job is retried, not marked done."""
+    from services.sheets import ensure_sheet_exists, append_to_sheet
+
+    ensure_sheet_exists("VoiceInterviews", headers=VOICE_INTERVIEW_HEADERS)
+    row = [
+        datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        candidate_email,
+        job_title,
+        grades.get("score"),
+        grades.get("verdict"),
+        grades.get("feedback"),
+        f"Grading Job {job_id}"  # Full transcript is kept with the job (grading_jobs.db)
+    ]
+    append_to_sheet("VoiceInterviews!A:G", [row])
+
+
+def _process_job(row):
+    job_id, candidate_email, job_title, history, user_input, attempts, saved_result = row
+    attempt = attempts + 1
+    if saved_result:
+        # Graded on an earlier attempt, only the Sheets write failed: don't pay for the LLM again
+        print(f"📝 Re-saving grades for interview job {job_id} (attempt {attempt}/{GRADING_MAX_ATTEMPTS})...")
+        _save_grades(job_id, candidate_email, job_title, json.loads(saved_result))
+        _update_job(job_id, status="done")
+        return
+
+    print(f"📝 Grading interview job {job_id} (attempt {attempt}/{GRADING_MAX_ATTEMPTS})...")
+    try:
+        grades = grade_transcript(job_title, history, user_input, fresh=attempts > 0)
+    except Exception as e:
+        if attempt < GRADING_MAX_ATTEMPTS:
+            delay = min(30 * (2 ** (attempt - 1)), 600)
+            print(f"⚠️ Grading job {job_id} failed ({e}). Retrying in {delay}s...")
+            _update_job(job_id, status="queued", error=str(e), next_attempt_at=time.time() + delay)
+            return
+        # Out of retries: still record the interview so HR can review it manually
+        print(f"❌ Grading job {job_id} failed after {attempt} attempts: {e}")
+        grades = {"score": "N/A", "verdict": "REVIEW", "feedback": "Automatic grading failed"}
+        _update_job(job_id, error=str(e), result=json.dumps(grades))
+        _save_grades(job_id, candidate_email, job_title, grades)
+        _update_job(job_id, status="failed")
+        return
+
+    # Keep the grade with the job first (also renews the lease), then write, then mark done
+    _update_job(job_id, result=json.dumps(grades))
+    _save_grades(job_id, candidate_email, job_title, grades)
+    _update_job(job_id, status="done", error=None)
+    print(f"✅ Saved Interview Results: {grades}")
+
+
+def _run_worker():
+    while True:
+        try:
+            row = _claim_next_job()
+        except Exception as e:
+            print(f"❌ Grading queue error: {e}")
+            row = None
+        if row is None:
+            _wake.wait(timeout=GRADING_POLL_SECONDS)
+            _wake.clear()
+            continue
+        try:
+            _process_job(row)
+        except Exception as e:
+            # Sheet write failures etc. -> back to the queue (still bounded by GRADING_MAX_ATTEMPTS)
+            print(f"❌ Grading job {row[0]} crashed: {e}")
+            if row[5] + 1 >= GRADING_MAX_ATTEMPTS:
+                _update_job(row[0], status="failed", error=str(e))
+            else:
+                _update_job(row[0], status="queued", error=str(e), next_attempt_at=time.time() + GRADING_POLL_SECONDS)
+
+
+def start_grading_worker():
+    """Starts the worker once per process (also resumes jobs left over from a restart)."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _db_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name="interview-grader", daemon=True)
+            _worker.start()
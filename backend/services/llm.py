@@ -1,16 +1,215 @@
 import os
-import random
+import time
+import threading
+from collections import deque
+import httpx
 from langchain_openai import ChatOpenAI
+from langchain_core.callbacks import BaseCallbackHandler
 
-def get_llm(model_name="llama-3.3-70b"):
-    # Collect all available keys dynamically (CEREBRAS_API_KEY_1, _2, _3...)
+# Rate-Limit-Aware Key Pool
+# get_llm used to rescan CEREBRAS_API_KEY_1..N on every call and random.choice one, with no idea
+# which key had just been rate limited. Now every key has:
+#   - token buckets for requests/minute and tokens/minute (LLM_KEY_RPM / LLM_KEY_TPM)
+#   - a cooldown learned from 429s (Retry-After / x-ratelimit-reset-* headers when present)
+#   - live load (calls in flight + clients just handed out)
+# get_llm picks the least-loaded key that has capacity; usage is reported back by a callback
+# attached to each client, so the pool sees real token counts and 429s. The requests/minute
+# bucket is charged by the shared HTTP client's request hook, i.e. only for calls that really go
+# out: LLM cache hits (and nothing else that never leaves the process) don't use up a key.
+#
+# Client Cache + Shared Connection Pool
+# Building a ChatOpenAI per call also built a fresh httpx client, so every node / parse attempt /
+# interview turn paid TCP + TLS setup again. Clients are now memoized per (model, key, temperature,
+# max_retries) and all of them share ONE keep-alive httpx.Client (thread-safe; the API key is a
+# per-request header, so keys can share connections). "connections_reused" in the metrics counts
+# requests that went out on an already-open connection.
+#
+# Responses are cached on disk by model + temperature + rendered prompt (services/llm_cache.py);
+# pass cache=False for conversational calls that must never be replayed.
+
+LLM_BASE_URL = "https://api.cerebras.ai/v1"
+KEY_RPM = float(os.getenv("LLM_KEY_RPM", "30"))
+KEY_TPM = float(os.getenv("LLM_KEY_TPM", "60000"))
+DEFAULT_COOLDOWN_SECONDS = float(os.getenv("LLM_KEY_COOLDOWN_SECONDS", "60"))
+MAX_WAIT_SECONDS = float(os.getenv("LLM_KEY_MAX_WAIT_SECONDS", "30"))  # get_llm waits at most this for a free key
+RESERVATION_SECONDS = 15  # A handed-out client counts as load until it starts a call (or this expires)
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "50"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60"))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.level
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= amount  # May go negative (real usage > estimate): the key is then skipped until refilled
+
+    def seconds_until(self, amount: float) -> float:
+        level = self.available()
+        return 0.0 if level >= amount else (amount - level) / self.rate
+
+
+class KeyState:
+    def __init__(self, index: int, api_key: str):
+        self.index = index
+        self.api_key = api_key
+        self.requests = TokenBucket(KEY_RPM)
+        self.tokens = TokenBucket(KEY_TPM)
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.reservations = deque()  # Expiry times of clients handed out but not yet used
+        self.stats = {"requests": 0, "tokens": 0, "rate_limited": 0, "errors": 0}
+
+    def load(self, now: float) -> int:
+        while self.reservations and self.reservations[0] <= now:
+            self.reservations.popleft()
+        return self.in_flight + len(self.reservations)
+
+    def seconds_until_ready(self, now: float) -> float:
+        return max(self.cooldown_until - now, self.requests.seconds_until(1), self.tokens.seconds_until(1), 0.0)
+
+
+def _retry_after_seconds(error) -> float:
+    """Cooldown suggested by a 429 response (Retry-After or Cerebras' reset headers), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens-minute"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(str(value).rstrip("s"))
+            except ValueError:
+                continue
+    return DEFAULT_COOLDOWN_SECONDS
+
+
+def is_rate_limit_error(error) -> bool:
+    text = str(error)
+    return (getattr(error, "status_code", None) == 429 or "429" in text
+            or "RESOURCE_EXHAUSTED" in text or "insufficient_quota" in text)
+
+
+class KeyUsageCallback(BaseCallbackHandler):
+    """Reports one key's calls (start / tokens used / 429s) back to its state. Stateless: shared by threads."""
+
+    def __init__(self, pool: "KeyPool", key: KeyState):
+        self.pool = pool
+        self.key = key
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.pool._on_start(self.key)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.pool._on_start(self.key)
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self.pool._on_end(self.key, usage.get("total_tokens", 0))
+
+    def on_llm_error(self, error, **kwargs):
+        self.pool._on_error(self.key, error)
+
+
+class KeyPool:
+    def __init__(self, keys: list):
+        self.keys = [KeyState(i + 1, k) for i, k in enumerate(keys)]
+        self._by_api_key = {k.api_key: k for k in self.keys}
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = MAX_WAIT_SECONDS) -> KeyState:
+        """Least-loaded key with request/token capacity; waits (bounded) if all are cooling down."""
+        if not self.keys:
+            raise ValueError("No CEREBRAS_API_KEY_x found in .env")
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                ready = [k for k in self.keys if k.seconds_until_ready(now) == 0]
+                if ready or now >= deadline:
+                    candidates = ready or self.keys
+                    if ready:
+                        # Least loaded first, then the one with the most headroom left this minute
+                        key = min(candidates, key=lambda k: (k.load(now), -k.requests.available() / k.requests.capacity,
+                                                             -k.tokens.available() / k.tokens.capacity))
+                    else:
+                        key = min(candidates, key=lambda k: k.seconds_until_ready(now))
+                    key.reservations.append(now + RESERVATION_SECONDS)
+                    return key
+                wait = min(min(k.seconds_until_ready(now) for k in self.keys), deadline - now)
+            print(f"⏳ All {len(self.keys)} LLM keys are rate limited. Waiting {wait:.1f}s...")
+            time.sleep(max(wait, 0.05))
+
+    def seconds_until_available(self) -> float:
+        """How long until ANY key can take a request (0 if one can right now)."""
+        with self._lock:
+            now = time.monotonic()
+            return min((k.seconds_until_ready(now) for k in self.keys), default=0.0)
+
+    def _on_start(self, key: KeyState):
+        with self._lock:
+            # A call starting on this key uses up the oldest reservation made by acquire()
+            if key.reservations:
+                key.reservations.popleft()
+            key.in_flight += 1
+
+    def _on_request(self, api_key: str):
+        """One real HTTP request sent with this key (incl. client-side retries, excl. cache hits)."""
+        key = self._by_api_key.get(api_key)
+        if key is None:
+            return
+        with self._lock:
+            key.requests.consume(1)
+            key.stats["requests"] += 1
+
+    def _on_end(self, key: KeyState, total_tokens: int):
+        with self._lock:
+            key.in_flight = max(key.in_flight - 1, 0)
+            key.tokens.consume(total_tokens)
+            key.stats["tokens"] += total_tokens
+
+    def _on_error(self, key: KeyState, error):
+        with self._lock:
+            key.in_flight = max(key.in_flight - 1, 0)
+            if is_rate_limit_error(error):
+                cooldown = _retry_after_seconds(error)
+                key.cooldown_until = max(key.cooldown_until, time.monotonic() + cooldown)
+                key.stats["rate_limited"] += 1
+                print(f"⚠️ LLM key #{key.index} rate limited. Cooling down for {cooldown:.0f}s")
+            else:
+                key.stats["errors"] += 1
+
+    def get_stats(self) -> list:
+        with self._lock:
+            now = time.monotonic()
+            return [{
+                "key": f"#{k.index} (...{k.api_key[-4:]})",
+                "in_flight": k.in_flight,
+                "load": k.load(now),
+                "cooldown_remaining_s": round(max(k.cooldown_until - now, 0), 1),
+                "rpm_utilization": round(1 - max(k.requests.available(), 0) / k.requests.capacity, 3),
+                "tpm_utilization": round(1 - max(k.tokens.available(), 0) / k.tokens.capacity, 3),
+                **k.stats
+            } for k in self.keys]
+
+
+def _load_keys() -> list:
+    # Collect all available keys (CEREBRAS_API_KEY legacy single key + CEREBRAS_API_KEY_1, _2, _3...)
     keys = []
-    
-    # Check legacy single key
     legacy_key = os.getenv("CEREBRAS_API_KEY")
     if legacy_key: keys.append(legacy_key.strip())
-    
-    # Check numbered keys
     i = 1
     while True:
         k = os.getenv(f"CEREBRAS_API_KEY_{i}")
@@ -18,19 +217,101 @@ def get_llm(model_name="llama-3.3-70b"):
             break
         keys.append(k.strip())
         i += 1
-        
-    if keys:
-        api_key = random.choice(keys)
-        # print(f"DEBUG: Selected Key #{keys.index(api_key)+1} (...{api_key[-4:]})")
-    else:
-        api_key = None
-
-    if not api_key:
-        raise ValueError("No CEREBRAS_API_KEY_x found in .env")
-    
-    return ChatOpenAI(
-        model=model_name,
-        openai_api_key=api_key,
-        openai_api_base="https://api.cerebras.ai/v1",
-        temperature=0
-    )
+    return keys
+
+
+_key_pool = None
+_key_pool_lock = threading.Lock()
+
+def get_key_pool() -> KeyPool:
+    """Built once, on first use (after .env has been loaded)."""
+    global _key_pool
+    if _key_pool is None:
+        with _key_pool_lock:
+            if _key_pool is None:
+                _key_pool = KeyPool(_load_keys())
+                print(f"🔑 LLM key pool: {len(_key_pool.keys)} key(s)")
+    return _key_pool
+
+
+_HTTP_STATS = {"requests": 0, "new_connections": 0}
+_HTTP_STATS_LOCK = threading.Lock()
+
+
+def _trace_http(event_name, info):
+    # httpcore trace hook: fires "connection.connect_tcp.*" only when a NEW connection is opened
+    if event_name == "connection.connect_tcp.started":
+        with _HTTP_STATS_LOCK:
+            _HTTP_STATS["new_connections"] += 1
+
+
+def _count_request(request):
+    request.extensions["trace"] = _trace_http
+    with _HTTP_STATS_LOCK:
+        _HTTP_STATS["requests"] += 1
+    # Charge the key's requests/minute bucket here, where we know the call really goes out
+    auth = request.headers.get("authorization", "")
+    if auth.startswith("Bearer "):
+        get_key_pool()._on_request(auth[len("Bearer "):])
+
+
+_http_client = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_http_client() -> httpx.Client:
+    """One keep-alive connection pool shared by every cached ChatOpenAI."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                                keepalive_expiry=HTTP_KEEPALIVE_SECONDS),
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            event_hooks={"request": [_count_request]}
+        )
+    return _http_client
+
+
+def get_llm(model_name="llama-3.3-70b", max_retries: int = 2, temperature: float = 0, cache: bool = True):
+    """
+    Chat client on the least-loaded healthy key (memoized per model/key/temperature/max_retries/cache).
+    Callers with their own key-switching retry loop pass max_retries=0 so a 429 reaches them
+    (and the pool) at once instead of being retried on the same hot key.
+    """
+    pool = get_key_pool()
+    key = pool.acquire()
+
+    from services.llm_cache import get_llm_cache, ModelResponseCache
+    store = get_llm_cache() if cache else None
+
+    cache_key = (model_name, key.index, temperature, max_retries, store is not None)
+    llm = _clients.get(cache_key)
+    if llm is None:
+        with _clients_lock:
+            llm = _clients.get(cache_key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=model_name,
+                    openai_api_key=key.api_key,
+                    openai_api_base=LLM_BASE_URL,
+                    temperature=temperature,
+                    max_retries=max_retries,
+                    http_client=_get_http_client(),
+                    # False (not None) when off, so a global LangChain cache can't sneak in either
+                    cache=ModelResponseCache(store, model_name, temperature) if store is not None else False,
+                    callbacks=[KeyUsageCallback(pool, key)]
+                )
+                _clients[cache_key] = llm
+    return llm
+
+
+def get_http_pool_stats() -> dict:
+    with _HTTP_STATS_LOCK:
+        stats = dict(_HTTP_STATS)
+    stats["connections_reused"] = max(stats["requests"] - stats["new_connections"], 0)
+    stats["reuse_ratio"] = round(stats["connections_reused"] / stats["requests"], 3) if stats["requests"] else 0.0
+    stats["cached_clients"] = len(_clients)
+    stats["max_connections"] = HTTP_MAX_CONNECTIONS
+    return stats
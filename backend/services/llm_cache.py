@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import sqlite3
+import ast
+import hashlib
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+# Persistent LLM Response Cache
+# Re-syncing a candidate or re-submitting an identical JD paid for the exact same completions
+# again. At temperature=0 those calls are effectively deterministic, so responses are cached on disk:
+#   key   = sha256(model, temperature, rendered prompt, output-affecting call settings)
+#           (stop, max_tokens, response_format, bound kwargs...; the API key, timeouts and retry
+#           settings are left out, so every key in the pool shares the same entries)
+#   value = the serialized generations LangChain returned
+# Plugged into every client built by get_llm (LangChain's per-model `cache=` hook), so JD extraction,
+# resume parsing, CV analysis, HR questions and the folder matcher all go through it.
+# Eviction: entries older than LLM_CACHE_TTL_SECONDS are dropped, then least recently used ones
+# until the store is under LLM_CACHE_MAX_BYTES.
+# Bypass: LLM_CACHE=0 turns it off, get_llm(cache=False) skips it for one client, and
+# `with bypass_llm_cache():` forces fresh completions (still written back) e.g. when retrying a
+# response that didn't parse (invoke_with_fresh_retry does that for one-shot JSON chains).
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_bypass = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache():
+    """LLM calls inside this block skip cache lookups (fresh responses still overwrite the entry)."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def invoke_with_fresh_retry(chain, inputs: dict):
+    """
+    chain.invoke for chains ending in an output parser: if the response doesn't parse, it is
+    requested once more with the cache bypassed (a cached bad completion would fail every time).
+    """
+    from langchain_core.exceptions import OutputParserException
+    try:
+        return chain.invoke(inputs)
+    except OutputParserException as e:
+        print(f"⚠️ Unparseable LLM output ({str(e)[:200]}). Retrying once without the LLM cache...")
+        with bypass_llm_cache():
+            return chain.invoke(inputs)
+
+
+def response_key(model: str, temperature, prompt: str, params: str = "") -> str:
+    return hashlib.sha256(json.dumps([model, temperature, prompt, params]).encode("utf-8")).hexdigest()
+
+
+# llm_string settings that change how a response is fetched, not what it says
+TRANSPORT_PARAMS = {
+    "openai_api_key", "api_key", "max_retries", "request_timeout", "timeout", "http_client",
+    "http_async_client", "default_headers", "default_query", "openai_proxy", "streaming",
+    "callbacks", "callback_manager", "verbose", "tags", "metadata", "cache",
+}
+
+
+@lru_cache(maxsize=512)
+def output_params(llm_string: str) -> str:
+    """
+    Canonical string of the output-affecting settings in LangChain's llm_string, which is
+    "<serialized model>---<sorted call params>" for serializable chat models (e.g. ChatOpenAI).
+    Unparseable parts are kept verbatim: a missed hit is fine, a wrong hit is not.
+    """
+    serialized, sep, call_params = llm_string.rpartition("---")
+    if not sep:
+        serialized, call_params = llm_string, ""
+
+    params = {}
+    try:
+        params.update(json.loads(serialized).get("kwargs", {}))
+    except (ValueError, AttributeError):
+        params["_model"] = serialized
+    if call_params:
+        try:
+            params.update({k: v for k, v in ast.literal_eval(call_params) if v is not None})
+        except (ValueError, SyntaxError, TypeError):
+            params["_call"] = call_params
+
+    kept = {k: v for k, v in params.items() if k not in TRANSPORT_PARAMS}
+    return json.dumps(kept, sort_keys=True, default=str)
+
+
+class LLMResponseCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_lru ON llm_responses (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "writes": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        if _bypass.get():
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, size, created_at FROM llm_responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= row[1]
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+        return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self._total_bytes += size
+            self.stats["writes"] += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drops expired entries, then least recently used ones until under max_bytes (caller holds the lock)."""
+        cursor = self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,))
+        if cursor.rowcount > 0:
+            self.stats["expired"] += cursor.rowcount
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if self._total_bytes <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM llm_responses ORDER BY last_access ASC"):
+            if self._total_bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+        self.stats["evictions"] += len(victims)
+        if victims:
+            print(f"🧹 LLM cache: evicted {len(victims)} least recently used responses")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        stats["bytes"] = self._total_bytes
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl_seconds"] = self.ttl
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+class ModelResponseCache(BaseCache):
+    """
+    LangChain cache hook for ONE (model, temperature). The key is model + temperature + the
+    rendered prompt + the output-affecting part of LangChain's llm_string (see output_params):
+    client settings like the API key, max_retries and timeouts are dropped from it.
+    """
+
+    def __init__(self, store: LLMResponseCache, model: str, temperature):
+        self.store = store
+        self.model = model
+        self.temperature = temperature
+
+    def lookup(self, prompt: str, llm_string: str):
+        cached = self.store.get(response_key(self.model, self.temperature, prompt, output_params(llm_string)))
+        if cached is None:
+            return None
+        try:
+            return [loads(g) for g in json.loads(cached)]
+        except Exception as e:
+            print(f"⚠️ LLM cache: unreadable entry ({e}), calling the model")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        try:
+            response = json.dumps([dumps(g) for g in return_val])
+        except Exception as e:
+            print(f"⚠️ LLM cache: response not serializable ({e}), not cached")
+            return
+        self.store.put(response_key(self.model, self.temperature, prompt, output_params(llm_string)),
+                       self.model, response)
+
+    def clear(self, **kwargs):
+        self.store.clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide response store (None when LLM_CACHE=0)."""
+    global _store
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LLMResponseCache()
+    return _store
@@ -1,5 +1,8 @@
 import requests
 import io
+import os
+import re
+import time
 import pdfplumber
 from pypdf import PdfReader
 import warnings
@@ -7,38 +10,114 @@ import warnings
 # Suppress pdfplumber font warnings globally (common with malformed PDFs)
 warnings.filterwarnings('ignore', message='.*FontBBox.*')
 
+# Adaptive Extraction
+# pdfplumber's layout analysis is accurate but slow, and it used to run on EVERY page (sometimes
+# followed by a full second pass with pypdf). Resumes only need the first few pages, and most
+# have a clean text layer. So per page:
+#   1. take pypdf's text layer (cheap)
+#   2. only if it looks garbled (two columns interleaved, run-together words, (cid:) glyphs,
+#      nearly empty) re-extract THAT page with pdfplumber and keep the better result
+#   3. stop once PDF_MAX_PAGES pages or PDF_MAX_CHARS characters are collected
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "6"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "40000"))  # ~ the batch planner's per-resume cap (10k tokens)
+
+MIN_PAGE_CHARS = 30
+CID_RE = re.compile(r'\(cid:\d+\)')
+
 def download_pdf(url: str) -> bytes:
     response = requests.get(url)
     response.raise_for_status()
     return response.content
 
-def extract_text_from_pdf(pdf_content: bytes) -> str:
-    # Suppress pdfplumber font warnings (common with malformed PDFs)
-    warnings.filterwarnings('ignore', message='.*FontBBox.*')
-    text = ""
-    # 1. Try pdfplumber (Better for layout/columns)
-    try:
-        with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-    except Exception as e:
-        print(f"pdfplumber failed: {e}")
+def garbled_reason(page_text: str):
+    """Why a page's text layer looks unusable (None if it looks fine)."""
+    stripped = page_text.strip()
+    if len(stripped) < MIN_PAGE_CHARS:
+        return "empty"
+    if CID_RE.search(stripped) or stripped.count('�') > len(stripped) * 0.01:
+        return "glyphs"
+    tokens = stripped.split()
+    single_chars = sum(1 for t in tokens if len(t) == 1)
+    if single_chars > len(tokens) * 0.4:
+        return "spaced"       # "J o h n  D o e" from interleaved columns
+    if len(stripped) / len(tokens) > 20:
+        return "run-together"  # Missing spaces between words
+    return None
+
+def extract_pdf_text(pdf_content: bytes, max_pages: int = PDF_MAX_PAGES, max_chars: int = PDF_MAX_CHARS):
+    """
+    Returns (text, info). info records the path taken for tuning:
+    pages, pypdf_pages, pdfplumber_pages, budget_stop, ms.
+    """
+    start = time.perf_counter()
+    info = {"pages": 0, "pypdf_pages": 0, "pdfplumber_pages": 0, "budget_stop": False}
+    parts = []
+    total_chars = 0
+    plumber_doc = None  # Opened lazily: most resumes never need it
 
-    # 2. Fallback to pypdf if text is suspiciously short or empty
-    if len(text.strip()) < 50:
-        print("Falling back to pypdf...")
+    def plumber_page(idx):
+        nonlocal plumber_doc
+        if plumber_doc is None:
+            plumber_doc = pdfplumber.open(io.BytesIO(pdf_content))
+        if idx >= len(plumber_doc.pages):
+            return ""
+        return plumber_doc.pages[idx].extract_text() or ""
+
+    try:
         try:
-            reader = PdfReader(io.BytesIO(pdf_content))
-            pypdf_text = ""
-            for page in reader.pages:
-                pypdf_text += page.extract_text() + "\n"
-            
-            # Use pypdf text if it managed to extract more
-            if len(pypdf_text) > len(text):
-                text = pypdf_text
+            pypdf_pages = PdfReader(io.BytesIO(pdf_content)).pages
+            page_count = len(pypdf_pages)
         except Exception as e:
             print(f"pypdf failed: {e}")
-            
+            pypdf_pages = None
+            plumber_doc = pdfplumber.open(io.BytesIO(pdf_content))
+            page_count = len(plumber_doc.pages)
+
+        for idx in range(page_count):
+            if idx >= max_pages or total_chars >= max_chars:
+                info["budget_stop"] = True
+                break
+
+            page_text = ""
+            if pypdf_pages is not None:
+                try:
+                    page_text = pypdf_pages[idx].extract_text() or ""
+                except Exception as e:
+                    print(f"pypdf failed on page {idx + 1}: {e}")
+
+            reason = garbled_reason(page_text) if pypdf_pages is not None else "no-pypdf"
+            if reason:
+                try:
+                    layout_text = plumber_page(idx)
+                    # Keep pdfplumber's text if it reads better (or simply has more of it)
+                    if layout_text and (not garbled_reason(layout_text) or len(layout_text) > len(page_text)):
+                        page_text = layout_text
+                        info["pdfplumber_pages"] += 1
+                    else:
+                        info["pypdf_pages"] += 1
+                except Exception as e:
+                    print(f"pdfplumber failed on page {idx + 1}: {e}")
+                    info["pypdf_pages"] += 1
+            else:
+                info["pypdf_pages"] += 1
+
+            info["pages"] += 1
+            if page_text:
+                parts.append(page_text)
+                total_chars += len(page_text) + 1
+    except Exception as e:
+        print(f"PDF extraction failed: {e}")
+    finally:
+        if plumber_doc is not None:
+            plumber_doc.close()
+
+    text = "\n".join(parts)  # Single join instead of repeated +=
+    info["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return text, info
+
+def extract_text_from_pdf(pdf_content: bytes) -> str:
+    text, info = extract_pdf_text(pdf_content)
+    print(f"📄 PDF extracted: {len(text)} chars, {info['pages']} pages "
+          f"(pypdf {info['pypdf_pages']}, pdfplumber {info['pdfplumber_pages']}"
+          f"{', budget stop' if info['budget_stop'] else ''}) in {info['ms']}ms")
     return text
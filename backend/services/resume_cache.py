@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+# Content-Addressed Resume Cache
+# Re-imports used to download and LLM-parse every resume again unless the exact
+# "Drive: {filename}" source key was already in the target sheet (renames / copies into another
+# job folder defeated that). Here each resume is cached on disk by WHAT it is, not where it is:
+#   key = Drive md5Checksum (same bytes anywhere in the tree -> same entry)
+#         or fileId + modifiedTime for Google Docs (Drive has no checksum for native docs)
+#   value = raw bytes, extracted text, parsed ResumeData JSON (each filled in as it becomes known)
+# A hit with parsed data costs zero downloads and zero LLM tokens. Size is bounded by an LRU cap.
+
+RESUME_CACHE_ENABLED = os.getenv("RESUME_CACHE", "1") != "0"
+RESUME_CACHE_PATH = os.getenv("RESUME_CACHE_PATH", "resume_cache.db")
+RESUME_CACHE_MAX_BYTES = int(os.getenv("RESUME_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+def cache_key(file_obj: dict) -> Optional[str]:
+    """Cache key for a Drive listing entry (needs md5Checksum or id+modifiedTime in the fields)."""
+    if file_obj.get("md5Checksum"):
+        return f"md5:{file_obj['md5Checksum']}"
+    if file_obj.get("id") and file_obj.get("modifiedTime"):
+        return f"file:{file_obj['id']}:{file_obj['modifiedTime']}"
+    return None
+
+
+class ResumeCache:
+    def __init__(self, path: str = RESUME_CACHE_PATH, max_bytes: int = RESUME_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resumes (
+                key TEXT PRIMARY KEY,
+                raw BLOB,
+                text TEXT,
+                parsed TEXT,
+                size INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resumes_lru ON resumes (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM resumes").fetchone()[0]
+        self.stats = {"hits": 0, "parsed_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[dict]:
+        """{'raw': bytes|None, 'text': str|None, 'parsed': dict|None} or None. Counts as a use (LRU)."""
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT raw, text, parsed FROM resumes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE resumes SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            if row[2]:
+                self.stats["parsed_hits"] += 1
+        return {"raw": row[0], "text": row[1], "parsed": json.loads(row[2]) if row[2] else None}
+
+    def put(self, key: str, raw: bytes = None, text: str = None, parsed: dict = None):
+        """Upserts whatever is known; fields left as None keep their cached value."""
+        if not key:
+            return
+        now = time.time()
+        parsed_json = json.dumps(parsed) if parsed is not None else None
+        with self._lock:
+            old = self._conn.execute("SELECT raw, text, parsed, size FROM resumes WHERE key = ?", (key,)).fetchone()
+            if old:
+                raw = raw if raw is not None else old[0]
+                text = text if text is not None else old[1]
+                parsed_json = parsed_json if parsed_json is not None else old[2]
+                self._total_bytes -= old[3]
+            size = len(raw or b"") + len((text or "").encode("utf-8")) + len((parsed_json or "").encode("utf-8"))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resumes (key, raw, text, parsed, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, COALESCE((SELECT created_at FROM resumes WHERE key = ?), ?), ?)",
+                (key, raw, text, parsed_json, size, key, now, now)
+            )
+            self._total_bytes += size
+            self.stats["writes"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops least recently used entries until under max_bytes (caller holds the lock)."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        cursor = self._conn.execute("SELECT key, size FROM resumes ORDER BY last_access ASC")
+        victims = []
+        for key, size in cursor:
+            if self._total_bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM resumes WHERE key = ?", victims)
+        self.stats["evictions"] += len(victims)
+        if victims:
+            print(f"🧹 Resume cache: evicted {len(victims)} least recently used entries")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+        stats["bytes"] = self._total_bytes
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_resume_cache() -> Optional[ResumeCache]:
+    """Process-wide cache (None when RESUME_CACHE=0)."""
+    global _cache
+    if not RESUME_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResumeCache()
+    return _cache
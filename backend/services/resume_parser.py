@@ -1,8 +1,12 @@
 from services.pdf import extract_text_from_pdf
 from services.docx_parser import extract_text_from_docx
-from services.llm import get_llm
+from services.llm import get_llm, get_key_pool, is_rate_limit_error
+from services.llm_cache import bypass_llm_cache
+from services.batch_planner import truncate_to_tokens
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.exceptions import OutputParserException
+from contextlib import nullcontext
 from pydantic import BaseModel, Field
 import json
 import time
@@ -50,7 +54,6 @@ def parse_resume(file_content: bytes, filename: str) -> dict:
         return {"error": "Insufficient text content"}
 
     # 2. LLM Extraction
-    llm = get_llm()
     parser = JsonOutputParser(pydantic_object=ResumeData)
     
     prompt = PromptTemplate(
@@ -68,43 +71,88 @@ def parse_resume(file_content: bytes, filename: str) -> dict:
         partial_variables={"format_instructions": parser.get_format_instructions()}
     )
     
-    chain = prompt | llm | parser
-
     max_retries = 5
-    base_delay = 62 # Seconds (> 60s to clear RPM limit)
+    fresh = False  # Set after an unparseable response: skip the LLM cache so it isn't replayed
     
     for attempt in range(max_retries):
         try:
+            # New client per attempt: the key pool hands out a key that isn't rate limited
+            chain = prompt | get_llm(max_retries=0) | parser
             # Gemini 1.5 Flash / 2.0 Flash handles large context easily.
             # No need for truncation logic or model fallback complexity.
-            result = chain.invoke({"text": text}) # Removed truncation
+            with bypass_llm_cache() if fresh else nullcontext():
+                result = chain.invoke({"text": text}) # Removed truncation
             print(f"DEBUG: {filename} - LLM Success: {result.get('Name')}")
             return result
         except Exception as e:
-            error_str = str(e)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
+            if is_rate_limit_error(e):
                 if attempt < max_retries - 1:
-                    sleep_time = base_delay + (attempt * 5) + random.uniform(0, 5)
-                    print(f"⚠️ Rate Limit (429) for {filename}. Sleeping {sleep_time:.1f}s before retry {attempt+1}/{max_retries}...")
+                    # The pool has put that key on cooldown: only wait if EVERY key is cooling down
+                    sleep_time = get_key_pool().seconds_until_available() + random.uniform(0, 1)
+                    print(f"⚠️ Rate Limit (429) for {filename}. Switching key in {sleep_time:.1f}s (retry {attempt+1}/{max_retries})...")
                     time.sleep(sleep_time)
                     continue
                 else:
                     print(f"❌ Failed after {max_retries} retries: {filename}")
                     return {"error": "Rate Limit Exceeded"}
+            elif isinstance(e, OutputParserException) and not fresh and attempt < max_retries - 1:
+                print(f"⚠️ Unparseable LLM output for {filename}. Retrying once without the LLM cache...")
+                fresh = True
+                continue
             else:
                 # Non-retryable error
                 print(f"DEBUG: {filename} - LLM Parse Error: {e}")
                 return {"error": f"LLM Parse Error: {str(e)}"}
 
-from typing import List, Tuple
+from typing import List, Tuple, Optional, Callable
+
+# Batch Results Are Matched By ID, Not Position
+# Every resume in a batch prompt gets an ID ("R1", "R2"...) and the model must echo it (plus the
+# filename) in each output item. Results are lined up with inputs by that echo, so a skipped or
+# reordered item can no longer attach one person's data to another person's file: unmatched
+# inputs simply come back as None. parse_resumes_batch_bisecting then retries those inputs in
+# halves until each one either parses or is isolated as a single failed file.
+
+class BatchResumeData(ResumeData):
+    Resume_ID: str = Field(description="The ID from the resume's header line, e.g. R3 (copy it exactly)")
+    Filename: str = Field(description="The filename from the resume's header line (copy it exactly)")
 
 class ResumeList(BaseModel):
-    resumes: List[ResumeData] = Field(description="List of extracted resume data")
+    resumes: List[BatchResumeData] = Field(description="List of extracted resume data, one per input resume")
+
 
-def parse_resumes_batch(batch_data: List[Tuple[str, str]]) -> List[dict]:
+def _match_batch_results(batch_data: List[Tuple[str, str]], data_list) -> List[Optional[dict]]:
+    """Lines LLM output items up with batch inputs by echoed Resume_ID (then unique Filename)."""
+    matched = [None] * len(batch_data)
+    by_name = {}
+    for idx, (fname, _) in enumerate(batch_data):
+        by_name.setdefault(fname.strip().lower(), []).append(idx)
+
+    for data in data_list or []:
+        if not isinstance(data, dict):
+            continue
+        idx = None
+        rid = str(data.get("Resume_ID", "")).strip().upper().lstrip("#").lstrip("R")  # "R3", "#3", "3"
+        if rid.isdigit() and 1 <= int(rid) <= len(batch_data):
+            idx = int(rid) - 1
+        else:
+            same_name = by_name.get(str(data.get("Filename", "")).strip().lower(), [])
+            if len(same_name) == 1:
+                idx = same_name[0]
+        if idx is None and len(batch_data) == 1 and len(data_list) == 1:
+            idx = 0  # Single-resume batch: nothing to confuse it with
+        if idx is None or matched[idx] is not None:
+            continue  # Unknown ID or a duplicate answer for the same input: trust neither
+        matched[idx] = {k: v for k, v in data.items() if k not in ("Resume_ID", "Filename")}
+    return matched
+
+
+def parse_resumes_batch(batch_data: List[Tuple[str, str]]) -> List[Optional[dict]]:
     """
     Parses a batch of resumes in one LLM call.
     batch_data: List of (filename, text_content)
+    Returns one entry per input, in input order: the parsed dict, or None if the LLM call failed
+    or no output item echoed that resume's ID.
     """
     import sys
     print(f"🚨 ENTERED parse_resumes_batch with {len(batch_data) if batch_data else 0} items")
@@ -113,6 +161,7 @@ def parse_resumes_batch(batch_data: List[Tuple[str, str]]) -> List[dict]:
     if not batch_data:
         print("⚠️ Empty batch_data, returning empty list")
         return []
+    failed = [None] * len(batch_data)
 
     print(f"DEBUG: Processing Batch of {len(batch_data)} resumes...")
     sys.stdout.flush()
@@ -120,18 +169,18 @@ def parse_resumes_batch(batch_data: List[Tuple[str, str]]) -> List[dict]:
     # Construct Giant Prompt
     combined_text = ""
     for idx, (fname, text) in enumerate(batch_data):
-        # Truncate to ~40k chars per resume to fit 1M window comfortably even with 20 files
-        safe_text = text[:40000] 
-        combined_text += f"\n--- RESUME #{idx+1} (Filename: {fname}) ---\n{safe_text}\n"
+        # Per-resume token cap (the batch planner already packed the batch under the token budget)
+        safe_text = truncate_to_tokens(text)
+        combined_text += f"\n--- RESUME R{idx+1} (Filename: {fname}) ---\n{safe_text}\n"
 
-    llm = get_llm()
     parser = JsonOutputParser(pydantic_object=ResumeList)
     
     prompt = PromptTemplate(
         template="""
         You are an expert Resume Parser. You are provided with a batch of {count} resumes text below.
         Extract the information for EACH resume and return a JSON object containing a list of resumes.
-        Ensure the order matches the input order precisely.
+        Each resume starts with a header like "--- RESUME R3 (Filename: cv.pdf) ---".
+        For every resume, copy its ID (e.g. "R3") into Resume_ID and its filename into Filename exactly.
         
         Resume Batch Content:
         {text}
@@ -143,30 +192,92 @@ def parse_resumes_batch(batch_data: List[Tuple[str, str]]) -> List[dict]:
     )
     
     max_retries = 5
-    base_delay = 62 
+    fresh = False  # Set after an unparseable response: skip the LLM cache so it isn't replayed
     
     for attempt in range(max_retries):
         try:
-            # Re-Get LLM on every attempt to allow Key Switching
-            llm = get_llm()
-            # Add timeout to prevent hanging on slow API responses
-            llm.request_timeout = 120  # 2 minutes max per batch
+            # Re-Get LLM on every attempt to allow Key Switching (pool skips rate-limited keys)
+            # Add timeout to prevent hanging on slow API responses. Per-call (bind), because the
+            # client itself is shared with every other caller.
+            llm = get_llm(max_retries=0).bind(timeout=120)  # 2 minutes max per batch
             chain = prompt | llm | parser
 
             print(f"⏱️ Calling LLM API (attempt {attempt + 1}/{max_retries}, timeout=120s)...")
-            result = chain.invoke({"text": combined_text, "count": len(batch_data)})
+            with bypass_llm_cache() if fresh else nullcontext():
+                result = chain.invoke({"text": combined_text, "count": len(batch_data)})
             # Result should be {"resumes": [...]}
-            data_list = result.get("resumes", [])
-            print(f"DEBUG: Batch Success! Extracted {len(data_list)} items.")
-            return data_list
+            data_list = result.get("resumes", []) if isinstance(result, dict) else []
+            matched = _match_batch_results(batch_data, data_list)
+            print(f"DEBUG: Batch Success! Extracted {len(data_list)} items, "
+                  f"{sum(1 for m in matched if m is not None)}/{len(batch_data)} matched to inputs.")
+            return matched
             
         except Exception as e:
-            error_str = str(e)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "insufficient_quota" in error_str:
+            if is_rate_limit_error(e):
                 if attempt < max_retries - 1:
-                    sleep_time = base_delay + (attempt * 5) + random.uniform(0, 5)
+                    # Only wait when every key is cooling down (not a flat 62s per 429)
+                    sleep_time = get_key_pool().seconds_until_available() + random.uniform(0, 1)
                     print(f"⚠️ Batch Rate Limit (429/Quota). Sleeping {sleep_time:.1f}s and Rotating Key...")
                     time.sleep(sleep_time)
                     continue
+            elif isinstance(e, OutputParserException) and not fresh and attempt < max_retries - 1:
+                print("⚠️ Unparseable batch output. Retrying once without the LLM cache...")
+                fresh = True
+                continue
             print(f"❌ Batch LLM Error: {e}")
-            return [] # Fail batch
+            return failed # Fail batch (every input unparsed)
+    return failed
+
+
+def parse_resumes_batch_bisecting(batch_data: List[Tuple[str, str]], stats: dict = None,
+                                  on_call: Callable = None) -> List[Optional[dict]]:
+    """
+    parse_resumes_batch, plus recovery: inputs that came back unparsed (failed call, malformed
+    JSON, missing/unmatched items) are retried in two halves, recursively, so one bad CV ends up
+    isolated as a single failed file instead of costing the whole batch.
+    stats (optional) collects 'bisect_calls', 'recovered' and 'failed' counts.
+    on_call(batch_data, latency_s, ok) is invoked once, for the top-level call only (adaptive
+    batching). ok is False only if that call lost resumes which then parsed fine on a retry, i.e.
+    the batch was the problem. Resumes that fail even on their own are a content problem,
+    already isolated by bisection, so they don't count against the batch size.
+    """
+    if stats is None:
+        stats = {}
+    for k in ("bisect_calls", "recovered", "failed"):
+        stats.setdefault(k, 0)
+
+    top_call = {}
+
+    def run(batch, depth):
+        start = time.monotonic()
+        results = parse_resumes_batch(batch)
+        missing = [i for i, r in enumerate(results) if r is None]
+        if depth == 0:
+            top_call["latency_s"] = time.monotonic() - start
+            top_call["missing"] = missing
+        else:
+            stats["bisect_calls"] += 1
+            stats["recovered"] += len(batch) - len(missing)
+        if not missing:
+            return results
+        if len(batch) == 1:
+            stats["failed"] += 1
+            print(f"❌ LLM could not parse {batch[0][0]} on its own. Marking it failed.")
+            return results
+
+        print(f"🔪 {len(missing)}/{len(batch)} resumes unparsed. Retrying them in halves...")
+        retry = [batch[i] for i in missing]
+        if len(retry) == 1:
+            retried = run(retry, depth + 1)
+        else:
+            mid = (len(retry) + 1) // 2
+            retried = run(retry[:mid], depth + 1) + run(retry[mid:], depth + 1)
+        for i, r in zip(missing, retried):
+            results[i] = r
+        return results
+
+    results = run(batch_data, 0)
+    if on_call:
+        recovered_later = any(results[i] is not None for i in top_call["missing"])
+        on_call(batch_data, top_call["latency_s"], not recovered_later)
+    return results
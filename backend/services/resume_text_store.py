@@ -0,0 +1,127 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Optional
+
+# Extracted Resume Text Store
+# trigger-candidate-sync used to rebuild "resume_text" from the 7 summary columns written at import
+# time, so the CV analyzer never saw the actual resume. The import now saves the full normalized
+# text here (compressed, in SQLite) and analyze_cv_node reads it back locally - no re-download,
+# no re-extraction. Lookup is by Drive resume link (unique per file), falling back to the sheet's
+# source key ("Drive: {filename}" - not unique, the newest entry wins).
+# Compression: zstd when the 'zstandard' package is installed, otherwise zlib (stdlib).
+# The codec is stored per row, so both can be read back whatever is installed later.
+
+RESUME_TEXT_DB_PATH = os.getenv("RESUME_TEXT_DB_PATH", "resume_texts.db")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+URL_RE = re.compile(r'https?://[^\s"]+')
+
+
+def _compress(text: str):
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec: str, blob: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed text but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def normalize_link(resume_link) -> str:
+    """Sheet cells may hold the raw URL or a =HYPERLINK("url", "label") formula."""
+    if not resume_link:
+        return ""
+    match = URL_RE.search(str(resume_link))
+    return match.group(0) if match else ""
+
+
+class ResumeTextStore:
+    def __init__(self, path: str = RESUME_TEXT_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resume_texts (
+                key TEXT PRIMARY KEY,
+                source_key TEXT NOT NULL,
+                resume_link TEXT,
+                content_key TEXT,
+                codec TEXT NOT NULL,
+                blob BLOB NOT NULL,
+                chars INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resume_texts_link ON resume_texts (resume_link)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resume_texts_source ON resume_texts (source_key)")
+        self._conn.commit()
+        self.stats = {"writes": 0, "hits": 0, "misses": 0, "raw_bytes_written": 0, "stored_bytes_written": 0}
+
+    def put(self, source_key: str, text: str, resume_link: str = None, content_key: str = None):
+        if not source_key or not text:
+            return
+        codec, blob = _compress(text)
+        link = normalize_link(resume_link) or None
+        # One row per Drive file (link), else per content hash, else per source key
+        key = f"link:{link}" if link else (content_key or f"source:{source_key}")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resume_texts (key, source_key, resume_link, content_key, codec, blob, chars, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source_key.strip(), link, content_key, codec, blob, len(text), time.time())
+            )
+            self._conn.commit()
+            self.stats["writes"] += 1
+            self.stats["raw_bytes_written"] += len(text.encode("utf-8"))
+            self.stats["stored_bytes_written"] += len(blob)
+
+    def get(self, source_key: str = None, resume_link: str = None) -> Optional[str]:
+        """Full text by resume link first (unique per Drive file), then by source key."""
+        link = normalize_link(resume_link)
+        with self._lock:
+            row = None
+            if link:
+                row = self._conn.execute(
+                    "SELECT codec, blob FROM resume_texts WHERE resume_link = ? ORDER BY updated_at DESC LIMIT 1", (link,)
+                ).fetchone()
+            if row is None and source_key:
+                row = self._conn.execute(
+                    "SELECT codec, blob FROM resume_texts WHERE source_key = ? ORDER BY updated_at DESC LIMIT 1",
+                    (str(source_key).strip(),)
+                ).fetchone()
+            self.stats["hits" if row else "misses"] += 1
+        return _decompress(row[0], row[1]) if row else None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM resume_texts").fetchone()[0]
+        stats["codec"] = "zstd" if zstandard is not None else "zlib"
+        stats["compression_ratio"] = (round(stats["raw_bytes_written"] / stats["stored_bytes_written"], 2)
+                                      if stats["stored_bytes_written"] else 0.0)
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_resume_text_store() -> ResumeTextStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResumeTextStore()
+    return _store
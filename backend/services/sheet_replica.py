@@ -0,0 +1,392 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+from services.sheets import (
+    read_sheet, batch_read_sheets, get_all_sheet_titles, split_range, register_write_listener
+)
+
+# Local SQLite Read Replica of the hiring spreadsheet
+# Read endpoints (/candidates, /candidates/imported, /questions, /dashboard/stats) used to
+# download whole columns from Sheets on every request. The replica mirrors the candidate,
+# Analysis, HRQuestions, ActiveJobSheet and VoiceInterviews tabs locally:
+# - Background thread pulls only NEW rows (incremental) + a periodic full resync for edits/deletes.
+# - Our own appends/updates are applied immediately (write-through via sheets.register_write_listener).
+# - Reads are served locally as long as the tab was synced within the staleness bound.
+
+REPLICA_ENABLED = os.getenv("SHEET_REPLICA", "1") != "0"
+REPLICA_PATH = os.getenv("SHEET_REPLICA_PATH", "sheet_replica.db")
+REPLICA_MAX_STALENESS_SECONDS = float(os.getenv("SHEET_REPLICA_MAX_STALENESS_SECONDS", "60"))
+REPLICA_REFRESH_SECONDS = float(os.getenv("SHEET_REPLICA_REFRESH_SECONDS", "30"))
+REPLICA_FULL_SYNC_SECONDS = float(os.getenv("SHEET_REPLICA_FULL_SYNC_SECONDS", "900"))
+
+# Widest column we mirror. All replicated tabs fit in A:K today.
+REPLICA_LAST_COLUMN = "Z"
+
+SYSTEM_TABS = {"ActiveJobSheet", "HRQuestions", "VoiceInterviews", "Candidates"}
+
+EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+
+
+def _index_columns(sheet_name: str) -> Dict[str, int]:
+    """Which column holds name/email/job/date for each kind of tab."""
+    if sheet_name.startswith("Analysis - "):
+        return {"name": 0, "date": 7, "job": 8, "email": 9}
+    if sheet_name == "HRQuestions":
+        return {"date": 0, "name": 1, "job": 2}
+    if sheet_name == "ActiveJobSheet":
+        return {"job": 0, "date": 4}
+    if sheet_name == "VoiceInterviews":
+        return {"date": 0, "email": 1, "job": 2}
+    # Candidate tabs ("Candidates" / one tab per job): Source, Date, Name, Contact, ..., Job Applied For
+    return {"date": 1, "name": 2, "email": 3, "job": 9}
+
+
+def _index_values(sheet_name: str, row: List[Any]) -> Dict[str, Optional[str]]:
+    columns = _index_columns(sheet_name)
+    values = {}
+    for key in ("name", "email", "job", "date"):
+        idx = columns.get(key)
+        raw = str(row[idx]).strip() if idx is not None and len(row) > idx else ""
+        if key == "email":
+            match = EMAIL_RE.search(raw)
+            raw = match.group(0) if match else ""
+        if key == "date":
+            raw = raw.replace("T", " ").split(" ")[0]
+        values[key] = raw.lower() if key in ("name", "email") else raw
+    return values
+
+
+def _quote(sheet_name: str) -> str:
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def _column_index(letters: str) -> int:
+    n = 0
+    for ch in letters.upper():
+        n = n * 26 + (ord(ch) - ord('A') + 1)
+    return n - 1
+
+
+def _parse_column_span(cell_range: str):
+    """'A:K' -> (0, 11). Returns None for anything row-bounded (served live instead)."""
+    match = re.fullmatch(r'([A-Za-z]+):([A-Za-z]+)', cell_range.strip())
+    if not match:
+        return None
+    start, end = _column_index(match.group(1)), _column_index(match.group(2)) + 1
+    if end > _column_index(REPLICA_LAST_COLUMN) + 1:
+        return None
+    return start, end
+
+
+def _parse_start_cell(updated_range: str):
+    """"'Tab'!A12:K14" -> ("Tab", 0, 12)"""
+    sheet_name, cell_range = split_range(updated_range)
+    match = re.match(r'([A-Za-z]+)(\d+)', cell_range)
+    if not match:
+        return sheet_name, None, None
+    return sheet_name, _column_index(match.group(1)), int(match.group(2))
+
+
+def _slice_rows(rows: List[List[Any]], span) -> List[List[Any]]:
+    """Mimics what values.get would return for a narrower column range."""
+    start, end = span
+    sliced = []
+    for row in rows:
+        part = list(row[start:end])
+        while part and part[-1] == "":
+            part.pop()
+        sliced.append(part)
+    # Sheets omits trailing empty rows
+    while sliced and not sliced[-1]:
+        sliced.pop()
+    return sliced
+
+
+class SheetReplica:
+    def __init__(self, path: str = REPLICA_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.RLock()
+        self._thread = None
+        self._last_full_sync = 0.0
+        self.stats = {"reads": 0, "stale_refreshes": 0, "incremental_syncs": 0, "full_syncs": 0,
+                      "rows_pulled": 0, "rows_written_through": 0, "sync_errors": 0}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tabs (
+                    sheet TEXT PRIMARY KEY,
+                    synced_rows INTEGER NOT NULL DEFAULT 0,
+                    synced_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS rows (
+                    sheet TEXT NOT NULL,
+                    row_idx INTEGER NOT NULL,
+                    name TEXT, email TEXT, job TEXT, date TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (sheet, row_idx)
+                );
+                CREATE INDEX IF NOT EXISTS idx_rows_name ON rows (sheet, name);
+                CREATE INDEX IF NOT EXISTS idx_rows_email ON rows (sheet, email);
+                CREATE INDEX IF NOT EXISTS idx_rows_job ON rows (sheet, job);
+                CREATE INDEX IF NOT EXISTS idx_rows_date ON rows (sheet, date);
+            """)
+            self._conn.commit()
+
+    # --- Storage ---
+
+    def _tab_state(self, sheet_name: str):
+        cur = self._conn.execute("SELECT synced_rows, synced_at FROM tabs WHERE sheet = ?", (sheet_name,))
+        return cur.fetchone()
+
+    def tracked_tabs(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT sheet FROM tabs")]
+
+    def _store_rows(self, sheet_name: str, first_row: int, rows: List[List[Any]]):
+        records = []
+        for offset, row in enumerate(rows):
+            idx = _index_values(sheet_name, row)
+            records.append((sheet_name, first_row + offset, idx["name"], idx["email"], idx["job"], idx["date"],
+                            json.dumps(row, default=str)))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO rows (sheet, row_idx, name, email, job, date, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            records
+        )
+
+    def _max_row(self, sheet_name: str) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(row_idx), 0) FROM rows WHERE sheet = ?",
+                                  (sheet_name,)).fetchone()[0]
+
+    def _apply_full(self, sheet_name: str, rows: List[List[Any]], synced_at: float,
+                    keep_until: int = 0, current_synced: int = 0):
+        """
+        Replaces the tab with the pulled rows. Rows in (len(rows), keep_until] were written through
+        by us WHILE the read was in flight (so the read can't contain them): those are kept.
+        """
+        keep_until = max(keep_until, len(rows))
+        self._conn.execute("DELETE FROM rows WHERE sheet = ? AND (row_idx <= ? OR row_idx > ?)",
+                           (sheet_name, len(rows), keep_until))
+        self._store_rows(sheet_name, 1, rows)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO tabs (sheet, synced_rows, synced_at) VALUES (?, ?, ?)",
+            (sheet_name, max(len(rows), min(current_synced, keep_until)), synced_at)
+        )
+
+    def _apply_incremental(self, sheet_name: str, from_row: int, rows: List[List[Any]], synced_at: float,
+                           current_synced: int = 0):
+        if rows:
+            self._store_rows(sheet_name, from_row, rows)
+        # A write-through during the read may already have moved synced_rows further: never roll it back
+        self._conn.execute(
+            "UPDATE tabs SET synced_rows = ?, synced_at = ? WHERE sheet = ?",
+            (max(from_row - 1 + len(rows), current_synced), synced_at, sheet_name)
+        )
+
+    def get_rows(self, sheet_name: str) -> List[List[Any]]:
+        """All mirrored rows for a tab in sheet order (row 1 = header)."""
+        with self._lock:
+            cur = self._conn.execute("SELECT row_idx, data FROM rows WHERE sheet = ? ORDER BY row_idx", (sheet_name,))
+            result = []
+            for row_idx, data in cur:
+                # Fill transient gaps (write-through landed beyond what we've pulled) with blank rows
+                while len(result) < row_idx - 1:
+                    result.append([])
+                result.append(json.loads(data))
+            self.stats["reads"] += 1
+            return result
+
+    def find_rows(self, sheet_name: str, name: str = None, email: str = None, job: str = None) -> List[List[Any]]:
+        """Indexed lookup on a tab (case-insensitive name/email, exact job)."""
+        clauses, params = ["sheet = ?", "row_idx > 1"], [sheet_name]
+        if name is not None:
+            clauses.append("name = ?"); params.append(name.lower().strip())
+        if email is not None:
+            clauses.append("email = ?"); params.append(email.lower().strip())
+        if job is not None:
+            clauses.append("job = ?"); params.append(job.strip())
+        with self._lock:
+            cur = self._conn.execute(f"SELECT data FROM rows WHERE {' AND '.join(clauses)} ORDER BY row_idx", params)
+            return [json.loads(r[0]) for r in cur]
+
+    # --- Sync ---
+
+    def sync(self, sheet_names: List[str], full: bool = False):
+        """Pulls tabs from Sheets in ONE batchGet (new rows only unless full=True)."""
+        if not sheet_names:
+            return
+        ranges, plan = [], []
+        with self._lock:
+            for name in sheet_names:
+                state = self._tab_state(name)
+                planned_synced = state[0] if state else 0
+                planned_max = self._max_row(name)
+                # synced_rows == 0 also means "re-read everything" (see on_write)
+                from_row = 1 if (full or state is None) else state[0] + 1
+                ranges.append(f"{_quote(name)}!A{from_row}:{REPLICA_LAST_COLUMN}")
+                plan.append((name, from_row, planned_synced, planned_max))
+
+        synced_at = time.time()
+        try:
+            results = batch_read_sheets(ranges, raise_errors=True)
+        except Exception:
+            self.stats["sync_errors"] += 1
+            raise
+
+        with self._lock:
+            for (name, from_row, planned_synced, planned_max), range_name in zip(plan, ranges):
+                rows = results.get(range_name, [])
+                # The lock was released during the read: re-check what write-throughs did meanwhile
+                state = self._tab_state(name)
+                current_synced = state[0] if state else 0
+                if state and current_synced == 0 and planned_synced > 0:
+                    continue  # A partial-column write invalidated the tab mid-read: keep it marked for a full re-read
+                if from_row == 1:
+                    current_max = self._max_row(name)
+                    keep_until = current_max if current_max > planned_max else 0
+                    self._apply_full(name, rows, synced_at, keep_until, current_synced)
+                else:
+                    self._apply_incremental(name, from_row, rows, synced_at, current_synced)
+                self.stats["rows_pulled"] += len(rows)
+            self._conn.commit()
+            self.stats["full_syncs" if full else "incremental_syncs"] += 1
+
+    def ensure_fresh(self, sheet_names: List[str], max_staleness: float = None):
+        """Syncs (one API call) only the tabs that are unknown or older than the bound."""
+        bound = REPLICA_MAX_STALENESS_SECONDS if max_staleness is None else max_staleness
+        now = time.time()
+        stale = []
+        with self._lock:
+            for name in sheet_names:
+                state = self._tab_state(name)
+                if state is None or now - state[1] > bound:
+                    stale.append(name)
+        if stale:
+            self.stats["stale_refreshes"] += 1
+            self.sync(stale)
+        self.start_background_sync()
+
+    def on_write(self, updated_range: str, values: List[List[Any]]):
+        """Write-through: apply our own append/update at the rows the API reported."""
+        sheet_name, start_col, start_row = _parse_start_cell(updated_range)
+        if start_row is None:
+            return
+        with self._lock:
+            state = self._tab_state(sheet_name)
+            if state is None:
+                return  # Not mirrored (yet) -> picked up on first read
+            if start_col != 0:
+                # Partial-column writes are rare: mark the tab stale AND unsynced (synced_rows = 0),
+                # so the next ensure_fresh re-reads it from row 1 instead of only appending new rows
+                self._conn.execute("UPDATE tabs SET synced_rows = 0, synced_at = 0 WHERE sheet = ?", (sheet_name,))
+                self._conn.commit()
+                return
+
+            merged = []
+            for offset, new_row in enumerate(values):
+                cur = self._conn.execute("SELECT data FROM rows WHERE sheet = ? AND row_idx = ?",
+                                         (sheet_name, start_row + offset)).fetchone()
+                old_row = json.loads(cur[0]) if cur else []
+                merged.append(list(new_row) + old_row[len(new_row):])
+            self._store_rows(sheet_name, start_row, merged)
+
+            # Extend the contiguous synced region only if this write continues it
+            if start_row <= state[0] + 1:
+                new_synced = max(state[0], start_row + len(values) - 1)
+                self._conn.execute("UPDATE tabs SET synced_rows = ? WHERE sheet = ?", (new_synced, sheet_name))
+            self._conn.commit()
+            self.stats["rows_written_through"] += len(values)
+
+    # --- Background refresh ---
+
+    def start_background_sync(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sheet-replica-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(REPLICA_REFRESH_SECONDS)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Replica Refresh Error: {e}")
+
+    def refresh(self):
+        titles = set(get_all_sheet_titles())
+        if not titles:
+            return
+        job_titles = set()
+        if "ActiveJobSheet" in titles:
+            job_titles = {r[0].strip() for r in self.get_rows("ActiveJobSheet")[1:] if r and str(r[0]).strip()}
+
+        wanted = set(self.tracked_tabs())
+        wanted |= {t for t in titles if t in SYSTEM_TABS or t.startswith("Analysis - ") or t in job_titles}
+        # Tabs deleted from the spreadsheet would make the whole batchGet fail
+        targets = sorted(wanted & titles)
+
+        full = time.time() - self._last_full_sync > REPLICA_FULL_SYNC_SECONDS
+        self.sync(targets, full=full)
+        if full:
+            self._last_full_sync = time.time()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["tabs"] = {name: {"rows": rows, "age_seconds": round(time.time() - at, 1)}
+                             for name, rows, at in self._conn.execute("SELECT sheet, synced_rows, synced_at FROM tabs")}
+        return stats
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+def get_replica() -> Optional[SheetReplica]:
+    global _replica
+    if not REPLICA_ENABLED:
+        return None
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = SheetReplica()
+                register_write_listener(_replica.on_write)
+    return _replica
+
+
+def read_sheet_replica(range_name: str, max_staleness: float = None) -> List[List[Any]]:
+    """
+    Drop-in for read_sheet() (FORMATTED_VALUE) served from the local replica.
+    Falls back to a live read if the replica is disabled, the range isn't a plain column span, or sync fails.
+    """
+    sheet_name, cell_range = split_range(range_name)
+    span = _parse_column_span(cell_range)
+    replica = get_replica()
+    if replica is None or span is None:
+        return read_sheet(range_name)
+    try:
+        replica.ensure_fresh([sheet_name], max_staleness)
+        return _slice_rows(replica.get_rows(sheet_name), span)
+    except Exception as e:
+        print(f"⚠️ Replica read failed for {range_name} ({e}). Reading live...")
+        return read_sheet(range_name)
+
+
+def batch_read_replica(ranges: List[str], max_staleness: float = None) -> Dict[str, List[List[Any]]]:
+    """Drop-in for batch_read_sheets(); stale tabs are refreshed together in one API call."""
+    replica = get_replica()
+    if not ranges:
+        return {}
+    if replica is None:
+        return batch_read_sheets(ranges)
+    try:
+        replica.ensure_fresh(list({split_range(r)[0] for r in ranges}), max_staleness)
+    except Exception as e:
+        print(f"⚠️ Replica batch refresh failed ({e}). Reading live...")
+        return batch_read_sheets(ranges)
+    return {r: read_sheet_replica(r, max_staleness) for r in ranges}
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from typing import List, Any
+from services.sheets import append_to_sheet
+
+# Write-behind Append Buffer
+# The pipeline nodes append ONE row at a time (Analysis, HRQuestions, VoiceInterviews).
+# Instead of one Sheets request per row, rows are queued per target range and flushed
+# as a single append per sheet, either when enough rows are pending or every few seconds.
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("SHEET_APPEND_FLUSH_SECONDS", "3"))
+FLUSH_MAX_ROWS = int(os.getenv("SHEET_APPEND_MAX_ROWS", "50"))
+FLUSH_MAX_RETRIES = int(os.getenv("SHEET_APPEND_MAX_RETRIES", "5"))
+BUFFER_ENABLED = os.getenv("SHEET_APPEND_BUFFER", "1") != "0"
+
+# Rows that still fail after all retries are saved here so nothing is silently lost
+DEAD_LETTER_FILE = "failed_sheet_appends.jsonl"
+
+
+class SheetAppendBuffer:
+    def __init__(self, flush_interval=FLUSH_INTERVAL_SECONDS, max_rows=FLUSH_MAX_ROWS, max_retries=FLUSH_MAX_RETRIES):
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_retries = max_retries
+
+        self._pending = OrderedDict()  # range_name -> [rows] (insertion order = flush order)
+        self._pending_count = 0
+        self._lock = threading.Lock()        # guards _pending
+        self._flush_lock = threading.Lock()  # one flush at a time keeps row order per sheet
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+        self.stats = {
+            "rows_queued": 0,
+            "rows_flushed": 0,
+            "flushes": 0,
+            "api_calls": 0,
+            "retries": 0,
+            "rows_dead_lettered": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def append(self, range_name: str, values: List[List[Any]]):
+        """Queues rows for range_name. Returns immediately."""
+        if not values:
+            return
+        if self._closed or not BUFFER_ENABLED:
+            append_to_sheet(range_name, values)
+            return
+
+        with self._lock:
+            self._pending.setdefault(range_name, []).extend(values)
+            self._pending_count += len(values)
+            self.stats["rows_queued"] += len(values)
+            should_wake = self._pending_count >= self.max_rows
+
+        self._ensure_worker()
+        if should_wake:
+            self._wake.set()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sheet-append-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Append Buffer Flush Error: {e}")
+
+    def flush(self):
+        """Writes everything pending: one append call per target range."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = OrderedDict()
+                self._pending_count = 0
+
+            start = time.perf_counter()
+            flushed = 0
+            for range_name, rows in batch.items():
+                if self._append_with_retry(range_name, rows):
+                    flushed += len(rows)
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["rows_flushed"] += flushed
+                self.stats["last_flush_ms"] = round(elapsed_ms, 1)
+                self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 1)
+                self.stats["total_flush_ms"] += elapsed_ms
+            print(f"📤 Append Buffer: flushed {flushed} rows to {len(batch)} sheet(s) in {elapsed_ms:.0f}ms")
+            return flushed
+
+    def _append_with_retry(self, range_name: str, rows: List[List[Any]]) -> bool:
+        for attempt in range(self.max_retries):
+            try:
+                append_to_sheet(range_name, rows)
+                with self._lock:
+                    self.stats["api_calls"] += 1
+                return True
+            except Exception as e:
+                if attempt < self.max_retries - 1:
+                    sleep_time = min(2 ** attempt, 30)
+                    print(f"⚠️ Append to '{range_name}' failed ({e}). Retry {attempt+1}/{self.max_retries} in {sleep_time}s...")
+                    with self._lock:
+                        self.stats["retries"] += 1
+                    time.sleep(sleep_time)
+                else:
+                    print(f"❌ Append to '{range_name}' failed after {self.max_retries} attempts: {e}")
+
+        self._dead_letter(range_name, rows)
+        return False
+
+    def _dead_letter(self, range_name: str, rows: List[List[Any]]):
+        try:
+            with open(DEAD_LETTER_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"range": range_name, "values": rows, "failed_at": time.time()}, default=str) + "\n")
+            print(f"⚠️ Saved {len(rows)} unsent rows for '{range_name}' to {DEAD_LETTER_FILE}")
+        except Exception as e:
+            print(f"❌ Could not save unsent rows for '{range_name}': {e} -> {rows}")
+        with self._lock:
+            self.stats["rows_dead_lettered"] += len(rows)
+
+    def close(self):
+        """Final flush on shutdown. Later appends go straight to the API."""
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["pending_rows"] = self._pending_count
+        stats["avg_flush_ms"] = round(stats["total_flush_ms"] / stats["flushes"], 1) if stats["flushes"] else 0.0
+        stats["total_flush_ms"] = round(stats["total_flush_ms"], 1)
+        return stats
+
+
+# Process-wide buffer used by the pipeline nodes / interview grader
+append_buffer = SheetAppendBuffer()
+atexit.register(append_buffer.close)
+
+
+def buffered_append(range_name: str, values: List[List[Any]]):
+    """Drop-in replacement for append_to_sheet when the caller doesn't need the API result."""
+    append_buffer.append(range_name, values)
+
+
+def flush_appends():
+    return append_buffer.flush()
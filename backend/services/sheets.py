@@ -1,9 +1,10 @@
+import re
 import os
-import json
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+import time
+import threading
 from typing import List, Dict, Any
 from dotenv import load_dotenv
+from services.google_clients import get_service_account_credentials, get_pooled_service
 
 load_dotenv()
 
@@ -14,20 +15,12 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
 
 def get_credentials():
-    creds_path = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
-    if not creds_path:
-        raise ValueError("GOOGLE_SERVICE_ACCOUNT_JSON not set")
-    
-    if os.path.exists(creds_path):
-        return Credentials.from_service_account_file(creds_path, scopes=SCOPES)
-    else:
-        # Assuming content is passed directly
-        info = json.loads(creds_path)
-        return Credentials.from_service_account_info(info, scopes=SCOPES)
+    # Cached process-wide (see services/google_clients.py)
+    return get_service_account_credentials(SCOPES)
 
 def get_service():
-    creds = get_credentials()
-    return build('sheets', 'v4', credentials=creds)
+    # Prebuilt per-thread service with keep-alive connections
+    return get_pooled_service('sheets', 'v4', get_credentials())
 
 def read_sheet(range_name: str, value_render_option: str = 'FORMATTED_VALUE') -> List[List[Any]]:
     service = get_service()
@@ -39,10 +32,11 @@ def read_sheet(range_name: str, value_render_option: str = 'FORMATTED_VALUE') ->
     ).execute()
     return result.get('values', [])
 
-def batch_read_sheets(ranges: List[str], value_render_option: str = 'FORMATTED_VALUE') -> Dict[str, List[List[Any]]]:
+def batch_read_sheets(ranges: List[str], value_render_option: str = 'FORMATTED_VALUE', raise_errors: bool = False) -> Dict[str, List[List[Any]]]:
     """
     Reads multiple ranges in a single API call.
     Returns a dictionary mapping range_name -> values list.
+    With raise_errors=True, API failures propagate instead of returning {}.
     """
     if not ranges:
         return {}
@@ -76,17 +70,61 @@ def batch_read_sheets(ranges: List[str], value_render_option: str = 'FORMATTED_V
         return results_map
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"❌ Batch Read Error: {e}")
         return {}
 
+# Observers called after every successful append/update with (updated_range, values).
+# Used by the local read replica for write-through (see services/sheet_replica.py).
+_WRITE_LISTENERS = []
+
+def register_write_listener(listener):
+    if listener not in _WRITE_LISTENERS:
+        _WRITE_LISTENERS.append(listener)
+
+def _stored_values(updated_data: Dict[str, Any], sent: List[List[Any]]) -> List[List[Any]]:
+    """
+    What Sheets actually holds after a USER_ENTERED write (leading ' stripped, numbers/dates
+    formatted), as returned with includeValuesInResponse. The API drops trailing empty cells/rows,
+    so pad back to the written shape: those cells were written empty.
+    """
+    if updated_data is None:
+        # No echo in the response -> approximate it (Sheets strips the leading ' and stores text)
+        return [[str(v)[1:] if str(v).startswith("'") else ("" if v is None else str(v)) for v in row]
+                for row in sent]
+    returned = updated_data.get('values', [])
+    rows = []
+    for i, sent_row in enumerate(sent):
+        row = list(returned[i]) if i < len(returned) else []
+        rows.append(row + [""] * (len(sent_row) - len(row)))
+    return rows
+
+def _notify_write(updated_range: str, values: List[List[Any]]):
+    if not updated_range:
+        return
+    for listener in _WRITE_LISTENERS:
+        try:
+            listener(updated_range, values)
+        except Exception as e:
+            print(f"⚠️ Write listener failed for {updated_range}: {e}")
+
 def append_to_sheet(range_name: str, values: List[List[Any]]):
     service = get_service()
     body = {
         'values': values
     }
-    result = service.spreadsheets().values().append(
-        spreadsheetId=SPREADSHEET_ID, range=range_name,
-        valueInputOption='USER_ENTERED', body=body).execute()
+    try:
+        result = service.spreadsheets().values().append(
+            spreadsheetId=SPREADSHEET_ID, range=range_name,
+            valueInputOption='USER_ENTERED', body=body,
+            includeValuesInResponse=True, responseValueRenderOption='FORMATTED_VALUE').execute()
+    except Exception:
+        # Tab may have been deleted/renamed behind our back -> don't trust cached metadata
+        invalidate_sheet_meta_cache()
+        raise
+    updates = result.get('updates', {})
+    _notify_write(updates.get('updatedRange'), _stored_values(updates.get('updatedData'), values))
     return result
 
 def write_to_sheet(range_name: str, values: List[List[Any]]):
@@ -94,18 +132,93 @@ def write_to_sheet(range_name: str, values: List[List[Any]]):
     body = {
         'values': values
     }
-    result = service.spreadsheets().values().update(
-        spreadsheetId=SPREADSHEET_ID, range=range_name,
-        valueInputOption='USER_ENTERED', body=body).execute()
+    try:
+        result = service.spreadsheets().values().update(
+            spreadsheetId=SPREADSHEET_ID, range=range_name,
+            valueInputOption='USER_ENTERED', body=body,
+            includeValuesInResponse=True, responseValueRenderOption='FORMATTED_VALUE').execute()
+    except Exception:
+        invalidate_sheet_meta_cache()
+        raise
+    _notify_write(result.get('updatedRange'), _stored_values(result.get('updatedData'), values))
+
+    # A direct write to row 1 may change the header row -> forget what we cached for that tab
+    sheet_name, cell_range = split_range(range_name)
+    if _range_starts_at_row1(cell_range):
+        with _SHEET_META_LOCK:
+            _SHEET_META_CACHE["headers"].pop(sheet_name, None)
     return result
 
-def ensure_sheet_exists(sheet_name: str, headers: List[str] = None):
+def _range_starts_at_row1(cell_range: str) -> bool:
+    """
+    "A1:K1", "B1", "$C$1:D" -> True; "A10", "A100:B" -> False.
+    No row number ("A:K", or just a tab name) means the range starts at row 1.
+    """
+    match = re.match(r'^\$?[A-Za-z]*\$?(\d*)', cell_range.strip())
+    start_row = match.group(1) if match else ""
+    return start_row in ("", "1")
+
+
+# Sheet Metadata Cache (tab titles + header rows)
+# Avoids a full spreadsheets().get() on every ensure_sheet_exists / dashboard load.
+SHEET_META_TTL = int(os.getenv("SHEET_META_TTL_SECONDS", "300"))
+
+_SHEET_META_CACHE = {
+    "titles": [],
+    "headers": {},  # sheet_name -> header row we know is in row 1
+    "timestamp": 0
+}
+_SHEET_META_LOCK = threading.Lock()
+
+def split_range(range_name: str):
+    """
+    Splits an A1 range into (sheet_name, cell_range).
+    "'Analysis - X'!A:K" -> ("Analysis - X", "A:K"), "HRQuestions" -> ("HRQuestions", "")
+    """
+    if "!" in range_name:
+        sheet_name, cell_range = range_name.rsplit("!", 1)
+    else:
+        sheet_name, cell_range = range_name, ""
+    if len(sheet_name) >= 2 and sheet_name.startswith("'") and sheet_name.endswith("'"):
+        sheet_name = sheet_name[1:-1].replace("''", "'")
+    return sheet_name, cell_range
+
+def invalidate_sheet_meta_cache():
+    """Forces the next metadata lookup to hit the API (titles AND headers)."""
+    with _SHEET_META_LOCK:
+        _SHEET_META_CACHE["titles"] = []
+        _SHEET_META_CACHE["headers"] = {}
+        _SHEET_META_CACHE["timestamp"] = 0
+
+def _get_sheet_titles(force_refresh: bool = False) -> List[str]:
+    current_time = time.time()
+    if not force_refresh and current_time - _SHEET_META_CACHE["timestamp"] < SHEET_META_TTL:
+        return list(_SHEET_META_CACHE["titles"])
+
     service = get_service()
-    spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-    sheets = spreadsheet.get('sheets', [])
-    sheet_titles = [s['properties']['title'] for s in sheets]
+    spreadsheet = service.spreadsheets().get(
+        spreadsheetId=SPREADSHEET_ID,
+        fields="sheets.properties.title"
+    ).execute()
+    titles = [s['properties']['title'] for s in spreadsheet.get('sheets', [])]
+
+    with _SHEET_META_LOCK:
+        _SHEET_META_CACHE["titles"] = titles
+        # Header knowledge expires together with the titles
+        _SHEET_META_CACHE["headers"] = {}
+        _SHEET_META_CACHE["timestamp"] = current_time
+    return list(titles)
+
+def _headers_match(sheet_name: str, headers: List[str]) -> bool:
+    cached = _SHEET_META_CACHE["headers"].get(sheet_name)
+    # Writing a shorter header list only touches its own cells, so a prefix match is enough
+    return cached is not None and cached[:len(headers)] == list(headers)
+
+def ensure_sheet_exists(sheet_name: str, headers: List[str] = None):
+    sheet_titles = _get_sheet_titles()
     
     if sheet_name not in sheet_titles:
+        service = get_service()
         # Create sheet
         body = {
             'requests': [{
@@ -116,25 +229,29 @@ def ensure_sheet_exists(sheet_name: str, headers: List[str] = None):
                 }
             }]
         }
-        service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body).execute()
+        try:
+            service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body).execute()
+        except Exception as e:
+            # Cache was stale (tab created elsewhere) -> refresh and carry on as "exists"
+            if "already exists" not in str(e):
+                raise
+            _get_sheet_titles(force_refresh=True)
         
-        # Add headers if provided
-        if headers:
-            append_to_sheet(f"{sheet_name}!A1", [headers])
-    else:
-        # Sheet exists! Verify and Update Headers if requested
-        # This fixes the issue where added columns (Email/Contact) don't get headers on existing sheets.
-        if headers:
-            # We force update the first row to match the new desired headers.
-            # This is safe because headers are fixed.
-            # Convert list of strings to list of lists [ [ "H1", "H2" ... ] ]
-            write_to_sheet(f"{sheet_name}!A1", [headers])
+        with _SHEET_META_LOCK:
+            if sheet_name not in _SHEET_META_CACHE["titles"]:
+                _SHEET_META_CACHE["titles"].append(sheet_name)
+        
+    # Verify and Update Headers if requested
+    # This fixes the issue where added columns (Email/Contact) don't get headers on existing sheets.
+    # Skipped when we already wrote (or saw) the same header row recently.
+    if headers and not _headers_match(sheet_name, headers):
+        # Convert list of strings to list of lists [ [ "H1", "H2" ... ] ]
+        write_to_sheet(f"{sheet_name}!A1", [headers])
+        with _SHEET_META_LOCK:
+            _SHEET_META_CACHE["headers"][sheet_name] = list(headers)
 
 def get_source_sheet_name():
-    service = get_service()
-    spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-    sheets = spreadsheet.get('sheets', [])
-    sheet_titles = [s['properties']['title'] for s in sheets]
+    sheet_titles = _get_sheet_titles()
     
     # Priority: Env Var -> "Candidates" -> First non-system sheet
     env_name = os.getenv("CANDIDATE_SOURCE_SHEET")
@@ -154,12 +271,10 @@ def get_source_sheet_name():
 
 def get_all_sheet_titles() -> List[str]:
     """
-    Returns a list of all sheet titles in the spreadsheet.
+    Returns a list of all sheet titles in the spreadsheet (cached, see SHEET_META_TTL).
     """
     try:
-        service = get_service()
-        spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-        return [s['properties']['title'] for s in spreadsheet.get('sheets', [])]
+        return _get_sheet_titles()
     except Exception as e:
         print(f"❌ Error getting sheet titles: {e}")
         return []
@@ -244,14 +359,15 @@ def get_all_job_descriptions():
         print(f"❌ Error reading Job Descriptions: {e}")
         return {}
 
-def get_all_job_titles():
+def get_all_job_titles(read_fn=None):
     """
     Optimized fetch: Reads ONLY the first column of ActiveJobSheet to get titles.
     Much faster than reading the whole sheet.
+    read_fn: optional reader with read_sheet's signature (e.g. the local replica).
     """
     try:
         # Read only Column A (Titles)
-        rows = read_sheet("ActiveJobSheet!A:A")
+        rows = (read_fn or read_sheet)("ActiveJobSheet!A:A")
         if not rows: return []
         
         # ActiveJobSheet always has a header row (e.g., "Job Title")
@@ -276,24 +392,11 @@ def get_all_job_titles():
 def get_candidate_name_by_email(job_title, email):
     """
     Looks up Candidate Name using Email in 'Analysis - {JobTitle}' sheet.
+    Served from the in-memory index (services/candidate_index.py), not a full-sheet scan.
     """
     try:
-        sheet_name = f"Analysis - {job_title}"
-        rows = read_sheet(f"{sheet_name}!A:K")
-        if not rows: return None
-        
-        # Email is in Column J (index 9), Name in Column A (index 0)
-        # Headers are in row 0, data starts row 1
-        
-        target_email = email.lower().strip()
-        
-        for row in rows[1:]:
-            if len(row) > 9:
-                row_email = row[9].lower().strip()
-                if row_email == target_email:
-                    return row[0].strip() # Name
-                    
-        return None
+        from services.candidate_index import find_candidate_name
+        return find_candidate_name(job_title, email)
     except Exception as e:
         print(f"❌ Error finding name for {email}: {e}")
         return None
@@ -301,28 +404,11 @@ def get_candidate_name_by_email(job_title, email):
 def get_questions_by_name(job_title, candidate_name):
     """
     Looks up Recommended Questions in 'HRQuestions' sheet.
-    Matches both Name and Job Title to be safe.
+    Matches both Name and Job Title to be safe. O(1) via services/candidate_index.py.
     """
     try:
-        rows = read_sheet("HRQuestions!A:E")
-        if not rows: return None
-        
-        # Schema: Date, Name, Job, ResumeLink, Questions
-        # Indices: 1, 2, 4
-        
-        target_name = candidate_name.lower().strip()
-        target_job = job_title.lower().strip()
-        
-        for row in rows[1:]:
-            if len(row) > 4:
-                row_name = row[1].lower().strip()
-                row_job = row[2].lower().strip()
-                
-                # Check match (Job + Name)
-                if row_name == target_name and row_job == target_job:
-                    return row[4] # The questions string
-        
-        return None
+        from services.candidate_index import find_questions
+        return find_questions(job_title, candidate_name)
     except Exception as e:
         print(f"❌ Error finding questions for {candidate_name}: {e}")
         return None
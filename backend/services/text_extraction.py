@@ -0,0 +1,244 @@
+import os
+import re
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+# Process-Pool Text Extraction
+# pdfplumber is CPU-heavy and holds the GIL: extracting a long scanned CV inline stalled the whole
+# import AND every other request served by that worker. Extraction now runs in worker processes:
+#   - EXTRACT_WORKERS processes (default: CPU count) -> real parallelism on multi-core hosts
+#   - workers are SPAWNED (fresh interpreters), not forked from the uvicorn process with its
+#     langchain / Google clients / thread arenas. Spawning is slow, so an import creates ONE
+#     ExtractionPool and passes it to every extract_texts call (batch) it makes; the workers are
+#     only replaced after a timeout or a crash. Each import has its own pool: concurrent imports
+#     never queue behind (or kill) each other's workers
+#   - per-file timeout: a file stuck past EXTRACT_TIMEOUT_SECONDS fails, and the pool is
+#     recycled (a busy worker can't be interrupted any other way). Since a call never submits
+#     more files than the pool has workers, a file's clock starts when it actually starts running
+#   - optional per-worker memory cap (EXTRACT_MAX_MEMORY_MB, RLIMIT_DATA, POSIX only; off by
+#     default) -> MemoryError for that file only
+#   - crash isolation: if a malformed PDF kills a worker, the files that were in flight are re-run
+#     one at a time, so only the file that actually crashes is reported as failed
+#   - results are yielded in completion order
+# EXTRACT_WORKERS=0 runs extraction inline (old behaviour).
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", "60"))
+EXTRACT_MAX_MEMORY_MB = int(os.getenv("EXTRACT_MAX_MEMORY_MB", "0"))  # 0 = no cap
+
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+_STATS = {"files": 0, "errors": 0, "timeouts": 0, "crashes": 0, "pool_restarts": 0, "total_extract_ms": 0.0,
+          # Which PDF path ran (see services/pdf.py), summed over all documents
+          "pdf_docs": 0, "pdf_pypdf_pages": 0, "pdf_pdfplumber_pages": 0, "pdf_budget_stops": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def extract_resume_text(content: bytes, filename: str, info: dict = None) -> str:
+    """
+    Bytes -> whitespace-normalized text, picked by extension (.pdf / .docx / anything else as UTF-8).
+    If info is given, the PDF extractor's path/timing details are copied into it.
+    """
+    from services.pdf import extract_pdf_text
+    from services.docx_parser import extract_text_from_docx
+
+    text = ""
+    if filename.lower().endswith(".pdf"):
+        text, pdf_info = extract_pdf_text(content)
+        print(f"📄 {filename}: {len(text)} chars from {pdf_info['pages']} pages (pypdf {pdf_info['pypdf_pages']}, "
+              f"pdfplumber {pdf_info['pdfplumber_pages']}{', budget stop' if pdf_info['budget_stop'] else ''}) "
+              f"in {pdf_info['ms']}ms")
+        if info is not None:
+            info.update(pdf_info)
+    elif filename.lower().endswith(".docx"):
+        text = extract_text_from_docx(content)
+    else:
+        try: text = content.decode('utf-8')
+        except: pass
+
+    if text:
+        text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def _init_worker(max_memory_mb: int):
+    # Cap the worker's heap (RLIMIT_DATA, not the whole address space, which also counts shared
+    # libraries and reserved-but-unused mappings) so a pathological PDF raises MemoryError instead
+    # of taking the host down. resource is POSIX-only (no cap on Windows).
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    except Exception:
+        pass
+
+
+def _extract_in_worker(content: bytes, filename: str):
+    start = time.perf_counter()
+    info = {}
+    text = extract_resume_text(content, filename, info)
+    return text, (time.perf_counter() - start) * 1000, info
+
+
+class ExtractionPool:
+    """
+    Worker processes for one import, reused by all of its extract_texts calls.
+    Workers are spawned on first use; close() (or leaving the `with` block) stops them.
+    Not for concurrent extract_texts calls: each call assumes the workers are all its own.
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS):
+        self.workers = max(1, workers)
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_MP_CONTEXT,
+                                                 initializer=_init_worker, initargs=(EXTRACT_MAX_MEMORY_MB,))
+        return self._executor
+
+    def replace(self, kill: bool):
+        """Drops the current workers (killing them if one is stuck); new ones spawn on next use."""
+        self.close(kill)
+        with _STATS_LOCK:
+            _STATS["pool_restarts"] += 1
+
+    def close(self, kill: bool = False):
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        if kill:
+            for proc in list((getattr(executor, "_processes", None) or {}).values()):
+                try:
+                    proc.terminate()
+                except Exception:
+                    pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _record(elapsed_ms: float = 0.0, info: dict = None, **counters):
+    with _STATS_LOCK:
+        _STATS["total_extract_ms"] += elapsed_ms
+        for k, v in counters.items():
+            _STATS[k] += v
+        if info and "pages" in info:
+            _STATS["pdf_docs"] += 1
+            _STATS["pdf_pypdf_pages"] += info["pypdf_pages"]
+            _STATS["pdf_pdfplumber_pages"] += info["pdfplumber_pages"]
+            _STATS["pdf_budget_stops"] += int(info["budget_stop"])
+
+
+def extract_texts(items, timeout: float = EXTRACT_TIMEOUT_SECONDS, pool: ExtractionPool = None):
+    """
+    items: iterable of (key, content, filename).
+    Yields (key, text, error) in completion order; error is None on success.
+    pool: the caller's ExtractionPool (kept alive between calls); without one, a pool is
+    spawned for this call only.
+    """
+    if EXTRACT_WORKERS <= 0:
+        for key, content, filename in items:
+            start = time.perf_counter()
+            info = {}
+            try:
+                text = extract_resume_text(content, filename, info)
+                _record((time.perf_counter() - start) * 1000, info, files=1)
+                yield key, text, None
+            except Exception as e:
+                _record(errors=1)
+                yield key, "", e
+        return
+
+    pending = deque((key, content, filename, 0) for key, content, filename in items)
+    isolated = deque()  # Survivors of a pool crash: re-run alone to find the culprit
+    in_flight = {}      # future -> (item, deadline)
+    own_pool = pool is None
+    if own_pool:
+        pool = ExtractionPool(min(EXTRACT_WORKERS, len(pending)))
+    workers = min(pool.workers, len(pending)) or 1
+
+    try:
+        while pending or isolated or in_flight:
+            # Never more files in flight than workers: a submitted file starts right away,
+            # so its deadline measures its own run time, not time spent queued
+            if isolated:
+                if not in_flight:
+                    item = isolated.popleft()
+                    in_flight[pool.executor.submit(_extract_in_worker, item[1], item[2])] = (item, time.monotonic() + timeout)
+            else:
+                while pending and len(in_flight) < workers:
+                    item = pending.popleft()
+                    in_flight[pool.executor.submit(_extract_in_worker, item[1], item[2])] = (item, time.monotonic() + timeout)
+
+            next_deadline = min(deadline for _, deadline in in_flight.values())
+            done, _ = wait(in_flight, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+
+            crashed = []
+            for future in done:
+                item, _ = in_flight.pop(future)
+                try:
+                    text, elapsed_ms, info = future.result()
+                    _record(elapsed_ms, info, files=1)
+                    yield item[0], text, None
+                except BrokenProcessPool:
+                    crashed.append(item)
+                except Exception as e:
+                    _record(errors=1)
+                    yield item[0], "", e
+
+            # Stuck files: fail them, kill the pool's workers, and re-queue everything else that was running
+            now = time.monotonic()
+            timed_out = [f for f, (_, deadline) in in_flight.items() if deadline <= now and not f.done()]
+            if timed_out:
+                for future in timed_out:
+                    item, _ = in_flight.pop(future)
+                    print(f"⏱️ Text extraction timed out for {item[2]} after {timeout:.0f}s")
+                    _record(errors=1, timeouts=1)
+                    yield item[0], "", TimeoutError(f"Extraction timed out after {timeout:.0f}s")
+                for item, _ in in_flight.values():
+                    pending.appendleft(item)
+                in_flight.clear()
+                pool.replace(kill=True)
+                continue
+
+            if crashed:
+                # The pool is dead: every other in-flight file goes down with it
+                for future, (item, _) in list(in_flight.items()):
+                    crashed.append(item)
+                in_flight.clear()
+                pool.replace(kill=False)
+                for item in crashed:
+                    if item[3] == 0:
+                        isolated.append((item[0], item[1], item[2], 1))
+                    else:
+                        # Crashed again while running alone -> this file is the culprit
+                        print(f"💥 Text extraction crashed the worker for {item[2]}")
+                        _record(errors=1, crashes=1)
+                        yield item[0], "", RuntimeError("Extractor process crashed (malformed file?)")
+    finally:
+        # Also runs if the caller stops iterating early: files still running would hold the
+        # workers (and skew the next call's deadlines), so a kept pool is replaced in that case
+        if own_pool:
+            pool.close(kill=bool(in_flight))
+        elif in_flight:
+            pool.replace(kill=True)
+
+
+def get_extraction_stats() -> dict:
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    stats["workers"] = EXTRACT_WORKERS
+    stats["avg_extract_ms"] = round(stats["total_extract_ms"] / stats["files"], 1) if stats["files"] else 0.0
+    stats["total_extract_ms"] = round(stats["total_extract_ms"], 1)
+    return stats
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+
+# Benchmarks the streaming DOCX extractor against the old python-docx one.
+# Usage (from backend/): python test_scripts/benchmark_docx.py <folder with sample CVs> [repeats]
+# Reports per-file timings, output size, and how many duplicated lines each extractor produced
+# (merged table cells are the usual source of duplicates with python-docx).
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.docx_parser import extract_text_from_docx, extract_text_from_docx_python_docx
+
+
+def time_extractor(fn, content, repeats):
+    best = None
+    text = ""
+    for _ in range(repeats):
+        start = time.perf_counter()
+        text = fn(content)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return text, best
+
+
+def duplicate_lines(text):
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    return len(lines) - len(set(lines))
+
+
+if len(sys.argv) < 2:
+    print("Usage: python test_scripts/benchmark_docx.py <folder with .docx files> [repeats]")
+    sys.exit(1)
+
+corpus_dir = sys.argv[1]
+repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+files = sorted(f for f in os.listdir(corpus_dir) if f.lower().endswith(".docx"))
+if not files:
+    print(f"No .docx files found in {corpus_dir}")
+    sys.exit(1)
+
+print(f"--- DOCX EXTRACTION BENCHMARK ({len(files)} files, best of {repeats}) ---\n")
+print(f"{'File':40} {'old ms':>8} {'new ms':>8} {'speedup':>8} {'old chars':>10} {'new chars':>10} {'old dup':>8} {'new dup':>8}")
+
+total_old = total_new = 0.0
+for name in files:
+    with open(os.path.join(corpus_dir, name), "rb") as f:
+        content = f.read()
+
+    old_text, old_ms = time_extractor(extract_text_from_docx_python_docx, content, repeats)
+    new_text, new_ms = time_extractor(extract_text_from_docx, content, repeats)
+    total_old += old_ms
+    total_new += new_ms
+
+    speedup = old_ms / new_ms if new_ms else 0
+    print(f"{name[:40]:40} {old_ms:8.1f} {new_ms:8.1f} {speedup:7.1f}x {len(old_text):10} {len(new_text):10} "
+          f"{duplicate_lines(old_text):8} {duplicate_lines(new_text):8}")
+
+    # Text the new extractor lost (should only ever be python-docx duplicates)
+    missing = {l.strip() for l in old_text.splitlines() if l.strip()} - {l.strip() for l in new_text.splitlines()}
+    if missing:
+        print(f"   ⚠️ {len(missing)} lines only in python-docx output, e.g. {sorted(missing)[:3]}")
+
+print(f"\nTOTAL: old {total_old:.1f}ms, new {total_new:.1f}ms "
+      f"({total_old / total_new if total_new else 0:.1f}x faster)")
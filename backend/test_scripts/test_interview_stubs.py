@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+
+# End-to-end check of the streamed interview flows against the local stub backends.
+# Usage (from backend/): python test_scripts/test_interview_stubs.py
+# No API keys needed: INTERVIEW_STUB_BACKENDS=1 makes STT decode the audio bytes as text and the
+# interviewer LLM replay INTERVIEW_STUB_REPLIES char by char (so <END_INTERVIEW> arrives split
+# across many chunks). Sheets lookups and the grading queue are replaced below for the same reason.
+# Checks, for /process/stream (SSE) and /ws (WebSocket):
+#   - events come in order: transcript -> token* -> done
+#   - the spoken tokens never contain any part of <END_INTERVIEW>, and add up to the done response
+#   - the second (final) turn is reported as terminated
+
+os.environ["INTERVIEW_STUB_BACKENDS"] = "1"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import services.sheets as sheets
+import routers.interview as interview
+from routers.interview import router, EndTokenFilter, END_TOKEN, INTERVIEW_STUB_REPLIES
+
+sheets.get_candidate_name_by_email = lambda job_title, email: None
+sheets.get_questions_by_name = lambda job_title, name: None
+interview.enqueue_grading = lambda email, job_title, history, user_input: "stub-grading-job"
+
+app = FastAPI()
+app.include_router(router, prefix="/api/interview")
+client = TestClient(app)
+
+JOB_TITLE = "Stub Engineer"
+# Stub STT returns the bytes as text; clips must still pass the MIN_AUDIO_BYTES check
+ANSWER = ("I led the migration of our billing service to an event driven design and "
+          "cut the nightly batch from four hours to twenty minutes.").encode("utf-8")
+
+
+def check_turn(events, expected_reply, expect_terminated):
+    """events: list of (event, payload) for one turn."""
+    kinds = [event for event, _ in events]
+    assert kinds[0] == "transcript", f"first event is {kinds[0]}"
+    assert kinds[-1] == "done", f"last event is {kinds[-1]}"
+    assert all(k == "token" for k in kinds[1:-1]), f"unexpected events in between: {kinds}"
+    assert len(kinds) > 3, "reply was not streamed in several tokens"
+
+    tokens = [payload["text"] for event, payload in events if event == "token"]
+    spoken = "".join(tokens)
+    for part in ("<", "END_", "INTERVIEW>"):
+        assert part not in spoken, f"end token leaked into the spoken text: {spoken!r}"
+    done = events[-1][1]
+    assert spoken.strip() == expected_reply.replace(END_TOKEN, "").strip(), spoken
+    assert done["response"] == spoken.strip(), done
+    assert done["transcript"] == ANSWER.decode("utf-8"), done
+    assert bool(done["is_terminated"]) == expect_terminated, done
+    if expect_terminated:
+        assert done.get("grading_job_id") == "stub-grading-job", done
+
+
+def parse_sse(body: str):
+    events = []
+    for frame in body.split("\n\n"):
+        if not frame.strip():
+            continue
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_end_token_filter():
+    # Token split at every possible point, plus text after it that must never be spoken
+    reply = "Thank you. " + END_TOKEN + " trailing"
+    for size in range(1, len(reply) + 1):
+        f = EndTokenFilter()
+        out = "".join(f.feed(reply[i:i + size]) for i in range(0, len(reply), size)) + f.flush()
+        assert out == "Thank you. ", (size, out)
+        assert f.terminated
+    # A prefix of the token that turns out not to be it is released, not swallowed
+    f = EndTokenFilter()
+    out = f.feed("a <END") + f.feed(" of story") + f.flush()
+    assert out == "a <END of story" and not f.terminated, out
+    print("✅ EndTokenFilter strips split tokens")
+
+
+def test_sse():
+    email = "sse-candidate@example.com"
+    history = ""
+    for i, reply in enumerate(INTERVIEW_STUB_REPLIES):
+        resp = client.post(
+            "/api/interview/process/stream",
+            data={"candidate_email": email, "job_title": JOB_TITLE, "history": history},
+            files={"audio": ("answer.webm", ANSWER, "audio/webm")},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        check_turn(parse_sse(resp.text), reply, expect_terminated=(i == len(INTERVIEW_STUB_REPLIES) - 1))
+        history += f"\nAI: {reply}\nCandidate: {ANSWER.decode('utf-8')}"
+    print("✅ /process/stream: transcript -> token* -> done, end token stripped")
+
+
+def test_websocket():
+    email = "ws-candidate@example.com"
+    url = f"/api/interview/ws?candidate_email={email}&job_title={JOB_TITLE}"
+    history = ""
+    with client.websocket_connect(url) as ws:
+        # Unknown control messages are reported, not fatal
+        ws.send_text(json.dumps({"type": "bogus"}))
+        assert ws.receive_json()["type"] == "error"
+
+        for i, reply in enumerate(INTERVIEW_STUB_REPLIES):
+            # Audio arrives in several binary frames while "speaking"
+            for start in range(0, len(ANSWER), 40):
+                ws.send_bytes(ANSWER[start:start + 40])
+            ws.send_text(json.dumps({"type": "end_of_speech", "history": history, "format": ".webm"}))
+
+            events = []
+            while True:
+                message = ws.receive_json()
+                kind = message.pop("type")
+                assert kind != "error", message
+                events.append((kind, message))
+                if kind == "done":
+                    break
+            check_turn(events, reply, expect_terminated=(i == len(INTERVIEW_STUB_REPLIES) - 1))
+            history += f"\nAI: {reply}\nCandidate: {ANSWER.decode('utf-8')}"
+    print("✅ /ws: transcript -> token* -> done, end token stripped, socket closed after the last turn")
+
+
+if __name__ == "__main__":
+    test_end_token_filter()
+    test_sse()
+    test_websocket()
+    print("\n🎉 Interview stub flows OK")